@@ -0,0 +1,189 @@
+import json
+
+from profiling import stage
+
+'''
+Compact models for QuickSight assets.
+Each model keeps the raw JSON bytes of the asset and its light top-level fields (everything but the heavy fields) in __slots__.
+Heavy fields such as PhysicalTableMap, LogicalTableMap or Definition are only materialized when accessed; the first
+access parses the raw bytes once and caches every heavy field of that asset until release() is called.
+This keeps an inventory of thousands of assets at roughly the size of their JSON text instead of nested dicts.
+
+Usage:
+    dataset = DataSet.from_file('qs_extracts/dataset1_dataset.json')
+    dataset.id, dataset.name                  # light fields, no parsing
+    dataset.physical_table_map                # materialized on first access
+    dataset['ImportMode']                     # any other top-level field, no parsing
+    dataset.release()                         # drop the materialized fields again
+'''
+
+
+class LazyField:
+    '''
+    Descriptor for a heavy top-level field, materialized from the raw JSON bytes on first access.
+    '''
+
+    def __init__(self, key):
+        self.key = key
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance._materialize().get(self.key)
+
+
+class Asset:
+    '''
+    Base class of the asset models.
+
+    Class attributes:
+        RESPONSE_KEY (str): The key wrapping the asset in the describe_* response, e.g. DataSet.
+        ID_KEY (str): The key of the asset ID, e.g. DataSetId.
+        HEAVY_KEYS (tuple): The top-level keys that are only materialized on access.
+    '''
+    __slots__ = ('id', 'arn', 'name', 'last_updated_time', '_raw', '_light', '_heavy')
+
+    RESPONSE_KEY = None
+    ID_KEY = None
+    HEAVY_KEYS = ()
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._heavy = None
+        with stage('parse asset'):
+            document = json.loads(raw)
+        self._light = {key: value for key, value in document.items() if key not in self.HEAVY_KEYS}
+        self.id = document.get(self.ID_KEY)
+        self.arn = document.get('Arn')
+        self.name = document.get('Name')
+        self.last_updated_time = document.get('LastUpdatedTime')
+
+    @classmethod
+    def from_dict(cls, document):
+        return cls(json.dumps(document, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8'))
+
+    @classmethod
+    def from_response(cls, response):
+        '''
+        Builds the model from a describe_* response, e.g. describe_data_set.
+        '''
+        return cls.from_dict(response[cls.RESPONSE_KEY])
+
+    @classmethod
+    def from_file(cls, file_path):
+        with stage('read extract'), open(file_path, 'rb') as f:
+            raw = f.read()
+        return cls(raw)
+
+    def _materialize(self):
+        if self._heavy is None:
+            with stage('materialize heavy fields'):
+                document = json.loads(self._raw)
+                self._heavy = {key: document.get(key) for key in self.HEAVY_KEYS}
+        return self._heavy
+
+    def __getitem__(self, key):
+        if key in self.HEAVY_KEYS:
+            return self._materialize()[key]
+        return self._light[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def release(self):
+        '''
+        Drops the materialized heavy fields. Changes made to them are lost unless saved with to_dict().
+        '''
+        self._heavy = None
+
+    def to_dict(self):
+        '''
+        Returns the full asset as a dict, including any changes made to the materialized heavy fields.
+        '''
+        document = json.loads(self._raw)
+        if self._heavy is not None:
+            document.update(self._heavy)
+        return document
+
+    @property
+    def raw_size(self):
+        return len(self._raw)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(id={self.id!r}, name={self.name!r})'
+
+
+class DataSource(Asset):
+    __slots__ = ()
+    RESPONSE_KEY = 'DataSource'
+    ID_KEY = 'DataSourceId'
+    HEAVY_KEYS = ('DataSourceParameters', 'AlternateDataSourceParameters')
+
+    data_source_parameters = LazyField('DataSourceParameters')
+
+
+class DataSet(Asset):
+    __slots__ = ()
+    RESPONSE_KEY = 'DataSet'
+    ID_KEY = 'DataSetId'
+    HEAVY_KEYS = ('PhysicalTableMap', 'LogicalTableMap', 'OutputColumns', 'ColumnGroups', 'FieldFolders',
+                  'DatasetParameters')
+
+    physical_table_map = LazyField('PhysicalTableMap')
+    logical_table_map = LazyField('LogicalTableMap')
+    output_columns = LazyField('OutputColumns')
+
+    def request(self, account_id, data_source_arn):
+        '''
+        Returns the create_data_set / update_data_set keyword arguments for the target account, with every physical
+        table pointed at data_source_arn.
+        '''
+        physical_table_map = self.physical_table_map
+        with stage('rewrite PhysicalTableMap'):
+            for table in physical_table_map.values():
+                for source in table.values():
+                    if isinstance(source, dict) and 'DataSourceArn' in source:
+                        source['DataSourceArn'] = data_source_arn
+        return {
+            'AwsAccountId': account_id,
+            'DataSetId': self.id,
+            'Name': self.name,
+            'PhysicalTableMap': physical_table_map,
+            'LogicalTableMap': self.logical_table_map,
+            'ImportMode': self['ImportMode'],
+            'DataSetUsageConfiguration': self['DataSetUsageConfiguration'],
+        }
+
+
+class Template(Asset):
+    __slots__ = ()
+    RESPONSE_KEY = 'Template'
+    ID_KEY = 'TemplateId'
+    HEAVY_KEYS = ('Version', 'Definition')
+
+    version = LazyField('Version')
+    definition = LazyField('Definition')
+
+
+class Analysis(Asset):
+    __slots__ = ()
+    RESPONSE_KEY = 'Analysis'
+    ID_KEY = 'AnalysisId'
+    HEAVY_KEYS = ('Sheets', 'DataSetArns', 'Definition')
+
+    sheets = LazyField('Sheets')
+    data_set_arns = LazyField('DataSetArns')
+    definition = LazyField('Definition')
+
+
+class Dashboard(Asset):
+    __slots__ = ()
+    RESPONSE_KEY = 'Dashboard'
+    ID_KEY = 'DashboardId'
+    HEAVY_KEYS = ('Version', 'Definition')
+
+    version = LazyField('Version')
+    definition = LazyField('Definition')
@@ -0,0 +1,127 @@
+import argparse
+import gc
+import glob
+import json
+import time
+import tracemalloc
+from asset_models import DataSet
+
+'''
+This script benchmarks the memory and throughput of the asset models in asset_models.py against plain dicts loaded with json.loads.
+It runs locally and makes no QuickSight calls. Either synthetic datasets are generated, or the *_dataset.json files of an extracts
+folder (created by get_data_sets.py) are used, repeated until the requested count is reached.
+
+Args:
+    count (int): The number of datasets to hold in memory. Defaults to 10000.
+    tables (int): The number of physical tables per synthetic dataset. Defaults to 5.
+    columns (int): The number of columns per synthetic table. Defaults to 40.
+    extracts_dir (str): Optional. A folder with *_dataset.json files to use instead of synthetic datasets.
+
+Return:
+    prints a table with the load time, retained memory and the time to read PhysicalTableMap of every dataset
+
+Execution:
+    python benchmark_asset_models.py --count 10000
+    python benchmark_asset_models.py --count 10000 --extracts-dir qs_extracts
+'''
+
+parser = argparse.ArgumentParser(description='Benchmark the asset models against plain dicts')
+parser.add_argument('--count', '-c', type=int, default=10000,
+                    help='The number of datasets to hold in memory')
+parser.add_argument('--tables', '-t', type=int, default=5,
+                    help='The number of physical tables per synthetic dataset')
+parser.add_argument('--columns', '-n', type=int, default=40,
+                    help='The number of columns per synthetic table')
+parser.add_argument('--extracts-dir', '-e', type=str,
+                    help='A folder with *_dataset.json files to use instead of synthetic datasets')
+
+args = parser.parse_args()
+
+
+def synthetic_dataset(index, tables, columns):
+    physical_table_map = {}
+    logical_table_map = {}
+    for t in range(tables):
+        table_id = f'table-{index}-{t}'
+        input_columns = [{'Name': f'column_{c}', 'Type': 'STRING'} for c in range(columns)]
+        physical_table_map[table_id] = {
+            'RelationalTable': {
+                'DataSourceArn': 'arn:aws:quicksight:us-west-2:123456789012:datasource/my-data-source',
+                'Schema': 'public',
+                'Name': f'table_{t}',
+                'InputColumns': input_columns,
+            }
+        }
+        logical_table_map[table_id] = {
+            'Alias': f'table_{t}',
+            'DataTransforms': [{'ProjectOperation': {'ProjectedColumns': [c['Name'] for c in input_columns]}}],
+            'Source': {'PhysicalTableId': table_id},
+        }
+    return {
+        'Arn': f'arn:aws:quicksight:us-west-2:123456789012:dataset/dataset-{index}',
+        'DataSetId': f'dataset-{index}',
+        'Name': f'Dataset {index}',
+        'CreatedTime': '2024-01-01 00:00:00+00:00',
+        'LastUpdatedTime': '2024-01-01 00:00:00+00:00',
+        'PhysicalTableMap': physical_table_map,
+        'LogicalTableMap': logical_table_map,
+        'OutputColumns': [{'Name': f'column_{c}', 'Type': 'STRING'} for c in range(columns)],
+        'ImportMode': 'DIRECT_QUERY',
+        'DataSetUsageConfiguration': {'DisableUseAsDirectQuerySource': False, 'DisableUseAsImportedSource': False},
+    }
+
+
+def load_raw_documents(count, tables, columns, extracts_dir):
+    if extracts_dir:
+        files = sorted(glob.glob(f'{extracts_dir}/*_dataset.json'))
+        if not files:
+            raise SystemExit(f'No *_dataset.json files found in {extracts_dir}')
+        contents = []
+        for file_path in files:
+            with open(file_path, encoding='utf-8') as f:
+                contents.append(f.read())
+        return [contents[i % len(contents)] for i in range(count)]
+    return [json.dumps(synthetic_dataset(i, tables, columns)) for i in range(count)]
+
+
+def measure(label, build, raw_documents):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    inventory = build(raw_documents)
+    load_seconds = time.perf_counter() - start
+    retained_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return label, inventory, load_seconds, retained_bytes
+
+
+def read_physical_table_maps(inventory, is_model):
+    start = time.perf_counter()
+    for asset in inventory:
+        if is_model:
+            len(asset.physical_table_map)
+            asset.release()
+        else:
+            len(asset['PhysicalTableMap'])
+    return time.perf_counter() - start
+
+
+raw_documents = load_raw_documents(args.count, args.tables, args.columns, args.extracts_dir)
+raw_total = sum(len(raw) for raw in raw_documents)
+print(f'{len(raw_documents)} datasets, {raw_total / 2 ** 20:.1f} MiB of JSON')
+
+# Both approaches start from the JSON text; the models encode their own copy so the kept bytes are counted.
+results = []
+for label, build, is_model in [
+    ('dict (json.loads)', lambda docs: [json.loads(raw) for raw in docs], False),
+    ('DataSet model', lambda docs: [DataSet(raw.encode('utf-8')) for raw in docs], True),
+]:
+    label, inventory, load_seconds, retained_bytes = measure(label, build, raw_documents)
+    access_seconds = read_physical_table_maps(inventory, is_model)
+    results.append((label, load_seconds, retained_bytes, access_seconds))
+    del inventory
+
+print(f"{'approach':<20}{'load (s)':>12}{'retained (MiB)':>18}{'datasets/s':>14}{'read tables (s)':>18}")
+for label, load_seconds, retained_bytes, access_seconds in results:
+    print(f'{label:<20}{load_seconds:>12.3f}{retained_bytes / 2 ** 20:>18.1f}'
+          f'{len(raw_documents) / load_seconds:>14.0f}{access_seconds:>18.3f}')
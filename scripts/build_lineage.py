@@ -0,0 +1,116 @@
+import argparse
+import copy
+import glob
+import json
+import os
+from lineage_index import INDEX_FILE_PATH, load_index, record_dataset, record_definition, record_references, save_index
+from profiling import add_profiling_arguments, configure_profiling, stage
+from result_output import log
+
+'''
+This script builds or updates the lineage index used by query_lineage.py, from files on disk. No QuickSight calls are made.
+Only files that changed since the last run are read again. Assets deployed through the scripts are added to the index automatically.
+Files read from the extracts folder:
+    <data_set_id>_dataset.json: the datasets saved by get_data_sets.py.
+    <asset_id>_template_definition.json, <asset_id>_analysis_definition.json, <asset_id>_dashboard_definition.json: optional,
+        the saved describe_*_definition response, used to find the columns each asset uses, e.g.
+        aws quicksight describe-analysis-definition --aws-account-id 123456789012 --analysis-id my-analysis-id > qs_extracts/my-analysis-id_analysis_definition.json
+An asset deployed before the index existed can be added with its dataset references file.
+
+Args:
+    extracts_dir (str): Optional. The folder with the extracted files. Defaults to qs_extracts.
+    index_file_path (str): Optional. The lineage index file. Defaults to qs_extracts/lineage_index.json.
+    rebuild (bool): Optional. Read every file again instead of only the changed ones.
+    asset_type (str): Optional. The type of an asset to add with --asset-id and --dataset-references-file-path.
+    asset_id (str): Optional. The ID of the asset to add.
+    dataset_references_file_path (str): Optional. The dataset references file of the asset to add.
+    source_arn (str): Optional. The ARN of the template or analysis the asset is built from.
+
+Return:
+    None
+
+Execution:
+    python build_lineage.py
+    python build_lineage.py --asset-type Dashboard --asset-id my-dashboard-id --dataset-references-file-path "./target_dataset_references.json" \
+    --source-arn "arn:aws:quicksight:us-west-2:123456789012:template/my-template"
+'''
+
+DEFINITION_ASSET_TYPES = {
+    'template': 'Template',
+    'analysis': 'Analysis',
+    'dashboard': 'Dashboard',
+}
+
+parser = argparse.ArgumentParser(description='Build or update the QuickSight lineage index')
+parser.add_argument('--extracts-dir', '-e', type=str, default='qs_extracts',
+                    help='The folder with the extracted files')
+parser.add_argument('--index-file-path', '-x', type=str, default=INDEX_FILE_PATH,
+                    help='The lineage index file')
+parser.add_argument('--rebuild', action='store_true',
+                    help='Read every file again instead of only the changed ones')
+parser.add_argument('--asset-type', '-a', type=str, choices=sorted(DEFINITION_ASSET_TYPES.values()),
+                    help='The type of an asset to add')
+parser.add_argument('--asset-id', '-i', type=str,
+                    help='The ID of the asset to add')
+parser.add_argument('--dataset-references-file-path', '-f', type=str,
+                    help='The dataset references file of the asset to add')
+parser.add_argument('--source-arn', '-s', type=str,
+                    help='The ARN of the template or analysis the asset is built from')
+
+add_profiling_arguments(parser)
+args = parser.parse_args()
+configure_profiling(args)
+
+extracts_dir = args.extracts_dir
+index_file_path = args.index_file_path
+
+if bool(args.asset_type) != bool(args.asset_id) or bool(args.asset_id) != bool(args.dataset_references_file_path):
+    parser.error('--asset-type, --asset-id and --dataset-references-file-path must be passed together')
+
+base = load_index(index_file_path)
+index = copy.deepcopy(base)
+if args.rebuild:
+    index['Files'] = {}
+
+if args.asset_id:
+    with open(args.dataset_references_file_path) as dataset_references_file:
+        dataset_references = json.load(dataset_references_file)
+    record_references(index, f'{args.asset_type}/{args.asset_id}', dataset_references, args.source_arn)
+    log(f'Added {args.asset_type} {args.asset_id} with {len(dataset_references)} dataset references')
+
+
+def changed(file_path):
+    stat = os.stat(file_path)
+    signature = {'MTime': stat.st_mtime, 'Size': stat.st_size}
+    if index['Files'].get(file_path) == signature:
+        return False
+    index['Files'][file_path] = signature
+    return True
+
+
+read = 0
+dataset_files = sorted(glob.glob(os.path.join(extracts_dir, '*_dataset.json')))
+for file_path in dataset_files:
+    if changed(file_path):
+        with stage('json.load extract'), open(file_path, encoding='utf-8') as dataset_file:
+            dataset = json.load(dataset_file)
+        record_dataset(index, dataset)
+        read += 1
+
+# Definitions after datasets, so their dataset identifiers resolve against the current references.
+definition_files = sorted(glob.glob(os.path.join(extracts_dir, '*_definition.json')))
+for file_path in definition_files:
+    asset_id, _, suffix = os.path.basename(file_path)[:-len('_definition.json')].rpartition('_')
+    if suffix not in DEFINITION_ASSET_TYPES or not changed(file_path):
+        continue
+    with stage('json.load extract'), open(file_path, encoding='utf-8') as definition_file:
+        definition = json.load(definition_file)
+    record_definition(index, f'{DEFINITION_ASSET_TYPES[suffix]}/{asset_id}', definition.get('Definition', definition))
+    read += 1
+
+for file_path in list(index['Files']):
+    if not os.path.exists(file_path):
+        del index['Files'][file_path]
+
+save_index(index, base, index_file_path)
+log(f'Read {read} of {len(dataset_files) + len(definition_files)} files, {len(index["Assets"])} assets in {index_file_path}')
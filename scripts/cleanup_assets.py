@@ -0,0 +1,307 @@
+import boto3
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
+from error_handling import call_with_retry, error_code, run_operation
+from lineage_index import INDEX_FILE_PATH, load_index
+from profiling import add_profiling_arguments, configure_profiling
+from rate_budget import RateBudget
+from result_output import add_output_arguments, configure_output, print_verbose, log
+
+'''
+This script deletes stale assets from the target account, e.g. obsolete dashboards piling up in a test account.
+Assets are selected from the account inventory (list calls) by ID prefix, tag and/or age; an asset must match every selector given.
+Deletions run in dependency order, dashboards, analyses, templates, datasets and then data sources, so no remaining asset
+loses what it is built from. The assets of one type are deleted in parallel within a rate budget, and the next type is only
+started once every deletion of the current one succeeded.
+Selected assets that an asset left in place is built from, directly or through other skipped assets, are skipped unless
+--force is given. Dependencies are read from the lineage index (see build_lineage.py). Only the assets the index records as
+deployed to the target account (by the migration scripts) count as left in place, so lineage of other accounts, or read from
+extracts, protects nothing here. The index does not record data sources: when data sources are selected, every dataset of the
+account is described to find the ones it uses.
+Every selected asset and its status is kept in a journal. An interrupted or failed cleanup is resumed with --resume, which
+deletes the remaining assets of the journal without selecting again. Assets already gone count as deleted.
+Failed deletions are not written to the dead-letter file, as replaying them would ignore the dependency order; use --resume.
+Use --dry-run first: it only lists the selected assets and the ones that would be skipped.
+For detailed explanation of the parameters, refer: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/quicksight/client/delete_dashboard.html
+Note: Ensure active credentials for the target account before executing this script.
+
+Args:
+    target_account_id (str): The AWS account ID of the target environment (e.g., test).
+    region_name (str): The AWS region where QuickSight is deployed.
+    asset_types (str []): Optional. The asset types to clean up. Defaults to all of Dashboard, Analysis, Template, DataSet and DataSource.
+    prefixes (str []): Optional. Select assets whose ID starts with any of these prefixes.
+    tags (str []): Optional. Select assets with all of these tags, as Key=Value, or Key for any value.
+    older_than_days (float): Optional. Select assets last updated more than this many days ago.
+    force_delete_without_recovery (bool): Optional. Delete analyses straight away instead of after the 30 day recovery window.
+        Kept in the journal for --resume.
+    journal_file_path (str): Optional. The cleanup journal. Defaults to qs_extracts/cleanup_journal.json.
+    resume (bool): Optional. Delete the remaining assets of the journal instead of selecting again.
+    force (bool): Optional. Also delete the selected assets that assets left in place are built from.
+    calls_per_second (float): Optional. The rate budget for QuickSight calls. Defaults to 2.
+    max_workers (int): Optional. The number of calls sent in parallel. Defaults to 8.
+    dry_run (bool): Optional. Only list the selected assets.
+
+Return:
+    Exits with 1 if any deletion failed.
+
+Execution:
+    python cleanup_assets.py --target-account-id 123456789012 --region-name us-west-2 --prefixes test- --older-than-days 30 --dry-run
+    python cleanup_assets.py --target-account-id 123456789012 --region-name us-west-2 --tags Stage=test --asset-types Dashboard Analysis
+    python cleanup_assets.py --target-account-id 123456789012 --region-name us-west-2 --resume
+'''
+
+# asset type: (list operation, summaries key, ID key, delete operation), in deletion order
+ASSET_TYPES = {
+    'Dashboard': ('list_dashboards', 'DashboardSummaryList', 'DashboardId', 'delete_dashboard'),
+    'Analysis': ('list_analyses', 'AnalysisSummaryList', 'AnalysisId', 'delete_analysis'),
+    'Template': ('list_templates', 'TemplateSummaryList', 'TemplateId', 'delete_template'),
+    'DataSet': ('list_data_sets', 'DataSetSummaries', 'DataSetId', 'delete_data_set'),
+    'DataSource': ('list_data_sources', 'DataSources', 'DataSourceId', 'delete_data_source'),
+}
+
+parser = argparse.ArgumentParser(description='Delete stale QuickSight assets in dependency order')
+parser.add_argument('--target-account-id', '-t', type=str, required=True,
+                    help='The AWS account ID of the target environment (e.g., test)')
+parser.add_argument('--region-name', '-r', type=str, required=True,
+                    help='The AWS region where QuickSight is deployed')
+parser.add_argument('--asset-types', '-a', nargs='+', type=str, choices=list(ASSET_TYPES), default=list(ASSET_TYPES),
+                    help='The asset types to clean up, seperated by a white space')
+parser.add_argument('--prefixes', '-p', nargs='+', type=str,
+                    help='Select assets whose ID starts with any of these prefixes, seperated by a white space')
+parser.add_argument('--tags', '-g', nargs='+', type=str,
+                    help='Select assets with all of these tags, as Key=Value or Key, seperated by a white space')
+parser.add_argument('--older-than-days', '-o', type=float,
+                    help='Select assets last updated more than this many days ago')
+parser.add_argument('--force-delete-without-recovery', action='store_true',
+                    help='Delete analyses straight away instead of after the recovery window')
+parser.add_argument('--journal-file-path', '-j', type=str, default='qs_extracts/cleanup_journal.json',
+                    help='The cleanup journal')
+parser.add_argument('--resume', action='store_true',
+                    help='Delete the remaining assets of the journal instead of selecting again')
+parser.add_argument('--force', action='store_true',
+                    help='Also delete the selected assets that assets left in place are built from')
+parser.add_argument('--calls-per-second', type=float, default=2,
+                    help='The rate budget for QuickSight calls')
+parser.add_argument('--max-workers', '-w', type=int, default=8,
+                    help='The number of calls sent in parallel')
+parser.add_argument('--dry-run', action='store_true',
+                    help='Only list the selected assets')
+
+add_output_arguments(parser)
+add_profiling_arguments(parser)
+args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
+
+target_account_id = args.target_account_id
+region_name = args.region_name
+journal_file_path = args.journal_file_path
+
+if not args.resume and not (args.prefixes or args.tags or args.older_than_days is not None):
+    parser.error('at least one of --prefixes, --tags and --older-than-days is required')
+
+client = boto3.client('quicksight', region_name=region_name)
+budget = RateBudget(args.calls_per_second)
+lock = threading.Lock()
+
+
+def parallel(function, items):
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        return list(executor.map(function, items))
+
+
+def load_journal():
+    if not os.path.exists(journal_file_path):
+        return None
+    with open(journal_file_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_journal():
+    os.makedirs(os.path.dirname(journal_file_path) or '.', exist_ok=True)
+    temp_file_path = f'{journal_file_path}.tmp'
+    with open(temp_file_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f, ensure_ascii=False, indent=4, default=str)
+    os.replace(temp_file_path, journal_file_path)
+
+
+def list_assets(asset_type):
+    list_operation, summaries_key, id_key = ASSET_TYPES[asset_type][:3]
+    summaries = []
+    kwargs = {'AwsAccountId': target_account_id}
+    while True:
+        budget.acquire()
+        response = call_with_retry(client, list_operation, **kwargs)
+        # Analyses in their recovery window are listed as DELETED.
+        summaries += [summary for summary in response.get(summaries_key, []) if summary.get('Status') != 'DELETED']
+        if not response.get('NextToken'):
+            return [{'AssetType': asset_type, 'AssetId': summary[id_key], 'Arn': summary['Arn'],
+                     'LastUpdatedTime': summary.get('LastUpdatedTime'), 'Status': 'pending'} for summary in summaries]
+        kwargs['NextToken'] = response['NextToken']
+
+
+def last_updated(entry):
+    value = entry['LastUpdatedTime']
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def has_tags(entry):
+    budget.acquire()
+    response = call_with_retry(client, 'list_tags_for_resource', ResourceArn=entry['Arn'])
+    tags = {tag['Key']: tag['Value'] for tag in response.get('Tags', [])}
+    for wanted in args.tags:
+        key, separator, value = wanted.partition('=')
+        if key not in tags or (separator and tags[key] != value):
+            return False
+    return True
+
+
+def select_assets():
+    '''
+    Returns the journal entries of every asset of the account matching all the selectors.
+    '''
+    cutoff = None
+    if args.older_than_days is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+    candidates = []
+    for asset_type in args.asset_types:
+        for entry in list_assets(asset_type):
+            if args.prefixes and not entry['AssetId'].startswith(tuple(args.prefixes)):
+                continue
+            if cutoff is not None and (entry['LastUpdatedTime'] is None or last_updated(entry) >= cutoff):
+                continue
+            candidates.append(entry)
+    # Tags need one call per asset, so they are only read for the assets matching the other selectors.
+    if args.tags:
+        candidates = [entry for entry, tagged in zip(candidates, parallel(has_tags, candidates)) if tagged]
+    return candidates
+
+
+def data_sources_of(data_set_id, data_source_keys):
+    budget.acquire()
+    try:
+        response = call_with_retry(client, 'describe_data_set', AwsAccountId=target_account_id, DataSetId=data_set_id)
+    except ClientError as e:
+        if error_code(e) == 'ResourceNotFoundException':
+            return []
+        log(f'Could not describe dataset {data_set_id}, keeping the selected data sources: {e}')
+        return list(data_source_keys)
+    return [f"DataSource/{table['DataSourceArn'].split('/')[-1]}"
+            for physical_table in response['DataSet'].get('PhysicalTableMap', {}).values()
+            for table in physical_table.values() if isinstance(table, dict) and table.get('DataSourceArn')]
+
+
+def upstream_assets(keys):
+    '''
+    Returns ({asset: [assets it is built from]}, the assets known to be in the target account), from the lineage index and,
+    if data sources are among keys, the datasets of the account.
+    '''
+    index_assets = load_index(INDEX_FILE_PATH)['Assets']
+    upstream = {key: list(entry['Upstream']) for key, entry in index_assets.items()}
+    in_account = {key for key, entry in index_assets.items() if target_account_id in entry.get('Accounts', [])}
+    data_source_keys = [key for key in keys if key.startswith('DataSource/')]
+    if data_source_keys:
+        data_set_ids = [entry['AssetId'] for entry in list_assets('DataSet')]
+        used = parallel(lambda data_set_id: data_sources_of(data_set_id, data_source_keys), data_set_ids)
+        for data_set_id, data_sources in zip(data_set_ids, used):
+            upstream.setdefault(f'DataSet/{data_set_id}', []).extend(data_sources)
+            in_account.add(f'DataSet/{data_set_id}')
+    return upstream, in_account
+
+
+def protected_assets(keys):
+    '''
+    Returns {asset of keys: the asset built from it} for every asset of keys that an asset of the target account outside keys
+    is built from, directly or through other protected assets.
+    '''
+    upstream, in_account = upstream_assets(keys)
+    protected = {}
+    pending = [key for key in in_account if key not in keys]
+    while pending:
+        key = pending.pop()
+        for parent in upstream.get(key, []):
+            if parent in keys and parent not in protected:
+                protected[parent] = key
+                pending.append(parent)
+    return protected
+
+
+def delete(entry):
+    asset_type, asset_id = entry['AssetType'], entry['AssetId']
+    id_key, delete_operation = ASSET_TYPES[asset_type][2:]
+    kwargs = {'AwsAccountId': target_account_id, id_key: asset_id}
+    if asset_type == 'Analysis' and journal['Selection'].get('ForceDeleteWithoutRecovery'):
+        kwargs['ForceDeleteWithoutRecovery'] = True
+    budget.acquire()
+    response = run_operation(client, delete_operation, asset_id, region_name, **kwargs)
+    with lock:
+        entry['Status'] = 'failed' if response is None else 'deleted'
+        save_journal()
+    if response is not None:
+        print_verbose(response)
+    return response is not None
+
+
+journal = load_journal()
+if args.resume:
+    if journal is None:
+        parser.error(f'no cleanup to resume in {journal_file_path}')
+    if (journal['AccountId'], journal['RegionName']) != (target_account_id, region_name):
+        parser.error(f"{journal_file_path} is a cleanup of {journal['AccountId']} in {journal['RegionName']}")
+    if args.force_delete_without_recovery:
+        journal['Selection']['ForceDeleteWithoutRecovery'] = True
+else:
+    if journal and not args.dry_run and any(entry['Status'] not in ('deleted', 'skipped') for entry in journal['Assets'].values()):
+        parser.error(f'{journal_file_path} has an unfinished cleanup, pass --resume or another --journal-file-path')
+    selected = select_assets()
+    journal = {
+        'AccountId': target_account_id,
+        'RegionName': region_name,
+        'Selection': {'AssetTypes': args.asset_types, 'Prefixes': args.prefixes, 'Tags': args.tags,
+                      'OlderThanDays': args.older_than_days, 'ForceDeleteWithoutRecovery': args.force_delete_without_recovery,
+                      'SelectedAt': datetime.now(timezone.utc).isoformat()},
+        'Assets': {f"{entry['AssetType']}/{entry['AssetId']}": entry for entry in selected},
+    }
+
+# Dependencies are checked again on --resume, as assets may have been added or removed since.
+remaining_keys = {key for key, entry in journal['Assets'].items() if entry['Status'] != 'deleted'}
+protected = protected_assets(remaining_keys)
+for key in remaining_keys:
+    journal['Assets'][key]['Status'] = 'skipped' if key in protected and not args.force else 'pending'
+remaining = [journal['Assets'][key] for key in remaining_keys if journal['Assets'][key]['Status'] == 'pending']
+log(f"{len(journal['Assets'])} assets selected, {len(remaining)} to delete in account {target_account_id}")
+for asset_type in ASSET_TYPES:
+    asset_ids = sorted(entry['AssetId'] for entry in remaining if entry['AssetType'] == asset_type)
+    if asset_ids:
+        log(f"{asset_type} ({len(asset_ids)}): {', '.join(asset_ids)}")
+for key, dependent in sorted(protected.items()):
+    if args.force:
+        if dependent not in remaining_keys:
+            log(f'Warning: {key} is used by {dependent}, which will not be deleted')
+    else:
+        log(f'Skipping {key}, {dependent} is built from it and will not be deleted')
+if protected and not args.force:
+    log(f'Skipped {len(protected)} assets, pass --force to delete them anyway')
+
+if args.dry_run:
+    raise SystemExit(0)
+
+save_journal()
+for asset_type in ASSET_TYPES:
+    level = [entry for entry in remaining if entry['AssetType'] == asset_type]
+    if not level:
+        continue
+    deleted = sum(parallel(delete, level))
+    log(f'Deleted {deleted} of {len(level)} {asset_type} assets')
+    if deleted < len(level):
+        log(f'Stopping before the assets the {asset_type} assets are built from; fix the failures and rerun with --resume')
+        raise SystemExit(1)
+
+log(f"Cleanup complete, journal written to {journal_file_path}")
@@ -1,7 +1,9 @@
 import boto3
-from pprint import pformat
 import argparse
 import json
+from error_handling import run_operation
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_verbose, log
 
 '''
 This script creates a new dashboard analysis within QuickSight.
@@ -39,7 +41,11 @@ parser.add_argument('--source-account-template-arn', '-s', type=str, required=Tr
 parser.add_argument('--dataset-references-file-path', '-f', type=str, required=True,
                     help='JSON file containing dataset references.')
 
+add_output_arguments(parser)
+add_profiling_arguments(parser)
 args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
 
 target_account_id = args.target_account_id
 region_name = args.region_name
@@ -50,14 +56,15 @@ dataset_references_file_path = args.dataset_references_file_path
 
 client = boto3.client('quicksight', region_name=region_name)
 
-print(f'Creating analysis {analysis_id} in account {target_account_id} using template {source_account_template_arn}')
+log(f'Creating analysis {analysis_id} in account {target_account_id} using template {source_account_template_arn}')
 
 dataset_references = None
 with open(dataset_references_file_path) as dataset_references_file:
     dataset_references = json.load(dataset_references_file)
-    print(f'Dataset references are \n {pformat(dataset_references)}')
+    print_verbose(dataset_references, 'Dataset references are')
 
-response = client.create_analysis(
+response = run_operation(
+    client, 'create_analysis', analysis_id, region_name,
     AwsAccountId=target_account_id,
     AnalysisId=analysis_id,
     Name=analysis_name,
@@ -69,4 +76,6 @@ response = client.create_analysis(
     },
 )
 
-print(pformat(response))
+print_verbose(response)
+if response is None:
+    raise SystemExit(1)
@@ -2,6 +2,11 @@ import boto3
 from pprint import pformat
 import json
 import argparse
+from error_handling import run_operation
+from asset_models import DataSet
+from preflight import preflight_data_sets, print_errors
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_verbose, log
 
 '''
 This script creates a new data set within QuickSight.
@@ -13,6 +18,7 @@ Args:
     region_name (str): The AWS region where QuickSight is deployed.
     data_set_list (str []): The IDs of the data sets that needs to be migrated. The result has to be a list of string.
     data_source_arn (str): The ARN of the data source that is used to create the data set.
+    skip_preflight (bool): Optional. Do not validate the requests against the QuickSight service model first (see preflight.py).
 
 Return:
     None
@@ -30,8 +36,14 @@ parser.add_argument('--data-set-list', '-d', nargs='+', type=str, required=True,
                     help='The IDs of the data sets that needs to be migrated seperated by a white space')
 parser.add_argument('--data-source-arn', '-s', type=str, required=True,
                     help='The ARN of the data source that is used to create the data set.')
+parser.add_argument('--skip-preflight', action='store_true',
+                    help='Do not validate the requests against the QuickSight service model before sending them.')
 
+add_output_arguments(parser)
+add_profiling_arguments(parser)
 args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
 
 target_account_id = args.target_account_id
 region_name = args.region_name
@@ -40,35 +52,29 @@ data_source_arn = args.data_source_arn
 
 client = boto3.client('quicksight', region_name=region_name)
 
-print(f'DataSet IDs received are {pformat(data_set_list)}')
+log(f'DataSet IDs received are {pformat(data_set_list)}')
 
+if not args.skip_preflight:
+    errors = preflight_data_sets('create_data_set', target_account_id, region_name, data_set_list, data_source_arn)
+    if errors:
+        print_errors(errors)
+        raise SystemExit(f'Pre-flight validation failed for {len(errors)} of {len(data_set_list)} data sets, nothing was sent')
+
+failed = 0
 for data_set_id in data_set_list:
     try:
-        with open(f'qs_extracts/{data_set_id}_dataset.json') as dataset_file:
-            dataset_json = json.load(dataset_file)
-
-            physical_table_map = dataset_json['PhysicalTableMap']
-            _keys = list(physical_table_map.keys())[:200]
-
-            array_length = len(_keys)
-            for i in range(array_length):
-                try:
-                    physical_table_map[_keys[i]]['CustomSql']['DataSourceArn'] = data_source_arn
-                except Exception as e:
-                    physical_table_map[_keys[i]]['RelationalTable']['DataSourceArn'] = data_source_arn
-
-            with open(f'qs_extracts/{data_set_id}_dataset_permissions.json') as dataset_perm_file:
-                dataset_perm_file_json = json.load(dataset_perm_file)
-            response = client.create_data_set(
-                AwsAccountId=target_account_id,
-                DataSetId=data_set_id,
-                Name=dataset_json['Name'],
-                PhysicalTableMap=dataset_json['PhysicalTableMap'],
-                LogicalTableMap=dataset_json['LogicalTableMap'],
-                ImportMode=dataset_json['ImportMode'],
-                DataSetUsageConfiguration=dataset_json['DataSetUsageConfiguration'],
-            )
-            print(pformat(response))
+        dataset = DataSet.from_file(f'qs_extracts/{data_set_id}_dataset.json')
+        with open(f'qs_extracts/{data_set_id}_dataset_permissions.json') as dataset_perm_file:
+            dataset_perm_file_json = json.load(dataset_perm_file)
+        response = run_operation(client, 'create_data_set', data_set_id, region_name,
+                                 **dataset.request(target_account_id, data_source_arn))
+        print_verbose(response)
+        if response is None:
+            failed += 1
 
     except Exception as e:
-        print(f'Error while migrating dataset {data_set_id}', e)
+        log(f'Error while migrating dataset {data_set_id}: {e}')
+        failed += 1
+
+if failed:
+    raise SystemExit(f'{failed} of {len(data_set_list)} data sets failed')
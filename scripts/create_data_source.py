@@ -1,10 +1,12 @@
 import boto3
-from pprint import pformat
+import time
+from error_handling import call_with_retry
+from result_output import emit_event
 
 '''
 This script creates a data source in QuickSight. 
 For detailed explanation of the parameters, refer: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/quicksight/client/create_data_source.html
-Note: Ensure active credentials before executing this script.
+Note: Ensure active credentials before executing this script. Failed calls are retried but never written to the dead-letter file, as the request carries credentials.
 
 Args:
     target_account_id (str): The AWS account ID of the target environment (e.g., prod).
@@ -37,7 +39,9 @@ data_source_credentials = {
 
 client = boto3.client('quicksight', region_name=region_name)
 
-response = client.create_data_source(
+started = time.perf_counter()
+response = call_with_retry(
+    client, 'create_data_source',
     AwsAccountId=target_account_id,
     DataSourceId=data_source_id,
     Name=data_source_name,
@@ -51,4 +55,4 @@ response = client.create_data_source(
     }
 )
 
-print(pformat(response))
+emit_event(data_source_id, 'create_data_source', started, response=response, kwargs={'AwsAccountId': target_account_id})
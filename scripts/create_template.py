@@ -1,7 +1,9 @@
 import boto3
-from pprint import pformat
 import argparse
 import json
+from error_handling import run_operation
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_verbose, log
 
 '''
 This script creates a new dashboard template within QuickSight.
@@ -54,7 +56,11 @@ parser.add_argument('--dataset-references-file-path', '-f', type=str, required=T
 parser.add_argument('--source-analysis-arn', '-a', type=str, required=True,
                     help='The ARN of the analysis to be copied.')
 
+add_output_arguments(parser)
+add_profiling_arguments(parser)
 args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
 
 source_account_id = args.source_account_id
 region_name = args.region_name
@@ -64,16 +70,17 @@ template_version = args.template_version
 dataset_references_file_path = args.dataset_references_file_path
 source_analysis_arn = args.source_analysis_arn
 
-print(f'Creating template with id {template_id} for analysis {source_analysis_arn}')
+log(f'Creating template with id {template_id} for analysis {source_analysis_arn}')
 
 dataset_references = None
 with open(dataset_references_file_path) as dataset_references_file:
     dataset_references = json.load(dataset_references_file)
-    print(f'Dataset references are \n {pformat(dataset_references)}')
+    print_verbose(dataset_references, 'Dataset references are')
 
 client = boto3.client('quicksight', region_name=region_name)
 
-response = client.create_template(
+response = run_operation(
+    client, 'create_template', template_id, region_name,
     AwsAccountId=source_account_id,
     TemplateId=template_id,
     Name=template_name,
@@ -86,4 +93,6 @@ response = client.create_template(
     VersionDescription=template_version
 )
 
-print(pformat(response))
+print_verbose(response)
+if response is None:
+    raise SystemExit(1)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from json_store import JsonStore
+from profiling import stage
+from result_output import log
+
+'''
+The last deployed state of the assets in the target accounts, used by scan_drift.py to detect changes made in the console.
+run_operation marks every asset it creates or updates as deployed and records its fingerprint and LastUpdatedTime right away,
+from a single describe: data sets and data sources always, templates, analyses and dashboards if their deployed version
+already reached *_SUCCESSFUL. scan_drift.py compares its scans against that record. The deploy never waits for a version:
+an asset whose baseline could not be recorded at deploy time (e.g. a version still in progress) stays pending, and the next
+scan records it.
+Assets flagged as drifted with scan_drift.py --block are refused by run_operation until they are re-recorded.
+Assets deleted through run_operation (e.g. by cleanup_assets.py) are removed from the state.
+
+State file (qs_extracts/deploy_state.json, with its journal qs_extracts/deploy_state.jsonl, see json_store.py):
+    {"Assets": {"123456789012/DataSet/dataset1": {"AccountId": "123456789012", "AssetType": "DataSet", "AssetId": "dataset1",
+     "DeployedAt": "...", "Fingerprint": "...", "LastUpdatedTime": "...", "Blocked": false}}}
+'''
+
+STATE_FILE_PATH = 'qs_extracts/deploy_state.json'
+
+# The asset type and ID parameter of every operation that deploys an asset.
+DEPLOY_OPERATIONS = {
+    'create_data_set': ('DataSet', 'DataSetId'),
+    'update_data_set': ('DataSet', 'DataSetId'),
+    'create_template': ('Template', 'TemplateId'),
+    'update_template': ('Template', 'TemplateId'),
+    'create_analysis': ('Analysis', 'AnalysisId'),
+    'update_analysis': ('Analysis', 'AnalysisId'),
+    'create_dashboard': ('Dashboard', 'DashboardId'),
+    'update_dashboard': ('Dashboard', 'DashboardId'),
+    'update_dashboard_published_version': ('Dashboard', 'DashboardId'),
+}
+
+# The asset type and ID parameter of every operation that deletes a deployed asset.
+DELETE_OPERATIONS = {
+    'delete_data_set': ('DataSet', 'DataSetId'),
+    'delete_template': ('Template', 'TemplateId'),
+    'delete_analysis': ('Analysis', 'AnalysisId'),
+    'delete_dashboard': ('Dashboard', 'DashboardId'),
+}
+
+# asset type: (describe operation, described key, definition operation), the describe calls of a fingerprint
+DESCRIBE_OPERATIONS = {
+    'DataSource': ('describe_data_source', 'DataSource', None),
+    'DataSet': ('describe_data_set', 'DataSet', None),
+    'Template': ('describe_template', 'Template', 'describe_template_definition'),
+    'Analysis': ('describe_analysis', 'Analysis', 'describe_analysis_definition'),
+    'Dashboard': ('describe_dashboard', 'Dashboard', 'describe_dashboard_definition'),
+}
+
+# Fields that change without anyone editing the asset.
+VOLATILE_KEYS = {'Arn', 'CreatedTime', 'LastUpdatedTime', 'ConsumedSpiceCapacityInBytes', 'Status', 'ErrorInfo',
+                 'RequestId', 'ResponseMetadata'}
+
+
+class DriftBlockedError(Exception):
+    '''
+    Raised by run_operation for an asset that scan_drift.py flagged as drifted and blocked.
+    '''
+
+
+def asset_key(account_id, asset_type, asset_id):
+    return f'{account_id}/{asset_type}/{asset_id}'
+
+
+def fingerprint(document):
+    '''
+    Returns a stable SHA-256 fingerprint of an asset description, ignoring volatile top-level fields.
+    '''
+    with stage('fingerprint'):
+        stable = {key: value for key, value in document.items() if key not in VOLATILE_KEYS}
+        encoded = json.dumps(stable, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def _store(state_file_path):
+    return JsonStore.at(state_file_path, ('Assets',))
+
+
+def load_state(state_file_path=STATE_FILE_PATH):
+    return _store(state_file_path).load()
+
+
+def save_state(state, base, state_file_path=STATE_FILE_PATH):
+    '''
+    Writes the entries changed since the state was loaded as base, keeping changes made meanwhile by other runs.
+    '''
+    _store(state_file_path).save(state, base)
+
+
+def deployed_asset(operation, kwargs):
+    '''
+    Returns (account_id, asset_type, asset_id) for a deploying operation, or None for any other operation.
+    '''
+    if operation not in DEPLOY_OPERATIONS:
+        return None
+    asset_type, id_key = DEPLOY_OPERATIONS[operation]
+    return kwargs.get('AwsAccountId'), asset_type, kwargs.get(id_key)
+
+
+def describe_fingerprint(call, account_id, asset_type, asset_id):
+    '''
+    Returns the fingerprint of an asset as described now: the describe_* result of data sources and data sets, and the name and
+    definition of templates, analyses and dashboards (their published version).
+
+    Args:
+        call: A function sending a QuickSight call, call(operation, **kwargs), e.g. call_with_retry bound to a client.
+    '''
+    describe_operation, described_key, definition_operation = DESCRIBE_OPERATIONS[asset_type]
+    id_key = f'{asset_type}Id'
+    if definition_operation is None:
+        return fingerprint(call(describe_operation, AwsAccountId=account_id, **{id_key: asset_id})[described_key])
+    response = call(definition_operation, AwsAccountId=account_id, **{id_key: asset_id})
+    return fingerprint({'Name': response.get('Name'), 'Definition': response['Definition']})
+
+
+def _baseline(call, account_id, asset_type, asset_id):
+    '''
+    Returns (fingerprint, LastUpdatedTime) of a deployed asset, or (None, None) if its version has not succeeded yet.
+    '''
+    describe_operation, described_key, definition_operation = DESCRIBE_OPERATIONS[asset_type]
+    try:
+        described = call(describe_operation, AwsAccountId=account_id, **{f'{asset_type}Id': asset_id})[described_key]
+        if definition_operation is None:
+            return fingerprint(described), str(described.get('LastUpdatedTime'))
+        status = described.get('Version', {}).get('Status', '')
+        if not status.endswith('_SUCCESSFUL'):
+            log(f'{asset_type} {asset_id} is {status or "not settled yet"}, its baseline is left to the next scan')
+            return None, None
+        return describe_fingerprint(call, account_id, asset_type, asset_id), str(described.get('LastUpdatedTime'))
+    except Exception as e:
+        log(f'Could not record the baseline of {asset_type} {asset_id}, it is left to the next scan: {e}')
+        return None, None
+
+
+def is_blocked(operation, kwargs, state_file_path=STATE_FILE_PATH):
+    asset = deployed_asset(operation, kwargs)
+    if asset is None:
+        return False
+    entry = _store(state_file_path).get('Assets', asset_key(*asset))
+    return bool(entry and entry.get('Blocked'))
+
+
+def mark_deployed(operation, kwargs, call=None, state_file_path=STATE_FILE_PATH):
+    '''
+    Marks the asset of a successful deploying operation as deployed. With call (see describe_fingerprint), also records its
+    fingerprint and LastUpdatedTime as the baseline when the deployed version already succeeded; otherwise the next scan records it.
+    '''
+    asset = deployed_asset(operation, kwargs)
+    if asset is None:
+        return
+    account_id, asset_type, asset_id = asset
+    current, last_updated_time = None, None
+    if call is not None:
+        current, last_updated_time = _baseline(call, account_id, asset_type, asset_id)
+    _store(state_file_path).set('Assets', asset_key(*asset), {
+        'AccountId': account_id,
+        'AssetType': asset_type,
+        'AssetId': asset_id,
+        'DeployedAt': datetime.now(timezone.utc).isoformat(),
+        'Fingerprint': current,
+        'LastUpdatedTime': last_updated_time,
+        'Blocked': False,
+    })
+
+
+def forget_deleted(operation, kwargs, state_file_path=STATE_FILE_PATH):
+    '''
+    Removes the asset of a successful deleting operation from the deploy state, so scan_drift.py does not report it as deleted.
+    '''
+    if operation not in DELETE_OPERATIONS:
+        return
+    asset_type, id_key = DELETE_OPERATIONS[operation]
+    key = asset_key(kwargs.get('AwsAccountId'), asset_type, kwargs.get(id_key))
+    if _store(state_file_path).get('Assets', key) is not None:
+        _store(state_file_path).set('Assets', key, None)
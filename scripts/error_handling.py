@@ -0,0 +1,193 @@
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+from botocore.exceptions import ClientError, ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, \
+    ReadTimeoutError
+from deploy_state import DriftBlockedError, forget_deleted, is_blocked, mark_deployed
+from lineage_index import record_deployed_lineage
+from profiling import stage
+from result_output import emit_event, log
+
+'''
+Shared failure handling for the migration scripts.
+Every QuickSight call made by the scripts goes through run_operation, which classifies failures into three kinds:
+    retriable: throttling, transient service and network errors. Retried in-process with exponential backoff and jitter.
+    exists: the asset is already present in the account. A create_* call is switched to the matching update_* call.
+    A delete_* call for an asset that is not found anymore counts as done.
+    permanent: everything else (validation, access, missing resources). Written to the dead-letter file straight away.
+Anything that still fails is appended to the dead-letter file (one JSON object per line) together with the exact
+API call, so replay_dead_letters.py can re-drive only the failed operations. Failed delete_* calls are not: replaying them
+one by one would ignore the dependency order of the deletions, so they are resumed with cleanup_assets.py --resume instead.
+Callers that re-drive their own failures in order (e.g. promote_dashboards.py --rollback) pass dead_letter_file_path=None.
+Successful deploys are marked in the deploy state (deploy_state.py), with their drift baseline, and the lineage index (lineage_index.py),
+and assets blocked by scan_drift.py --block are refused.
+Every operation emits one JSON-lines event and updates the result manifest (result_output.py).
+
+Dead-letter entry:
+    {"operation": "create_data_set", "asset_id": "dataset1", "region_name": "us-west-2", "kind": "permanent",
+     "error_code": "InvalidParameterValueException", "error_message": "...", "failed_at": "...", "kwargs": {...}}
+'''
+
+RETRIABLE = 'retriable'
+EXISTS = 'exists'
+PERMANENT = 'permanent'
+
+DEAD_LETTER_FILE_PATH = 'qs_extracts/dead_letters.jsonl'
+
+RETRIABLE_ERROR_CODES = {
+    'ThrottlingException',
+    'Throttling',
+    'TooManyRequestsException',
+    'InternalFailureException',
+    'InternalServerException',
+    'ServiceUnavailableException',
+    'ServiceUnavailable',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    # QuickSight raises ConflictException while another update on the same asset is still in progress.
+    'ConflictException',
+}
+EXISTS_ERROR_CODES = {
+    'ResourceExistsException',
+}
+RETRIABLE_EXCEPTIONS = (ConnectionClosedError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError)
+
+UPDATE_OPERATIONS = {
+    'create_data_set': 'update_data_set',
+    'create_template': 'update_template',
+    'create_analysis': 'update_analysis',
+    'create_dashboard': 'update_dashboard',
+}
+
+
+def error_code(error):
+    '''
+    Returns the AWS error code of a botocore ClientError, or the exception class name for anything else.
+    '''
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code', 'ClientError')
+    return type(error).__name__
+
+
+def classify_error(error):
+    '''
+    Classifies an exception raised by a QuickSight call.
+
+    Args:
+        error (Exception): The exception raised by boto3.
+
+    Return:
+        kind (str): One of RETRIABLE, EXISTS or PERMANENT.
+    '''
+    if isinstance(error, RETRIABLE_EXCEPTIONS):
+        return RETRIABLE
+    code = error_code(error)
+    if code in RETRIABLE_ERROR_CODES:
+        return RETRIABLE
+    if code in EXISTS_ERROR_CODES:
+        return EXISTS
+    return PERMANENT
+
+
+def call_with_retry(client, operation, max_attempts=5, base_delay=1.0, max_delay=20.0, **kwargs):
+    '''
+    Calls client.<operation>(**kwargs), retrying retriable failures with exponential backoff and full jitter.
+    Non-retriable failures, and retriable ones that run out of attempts, are re-raised.
+    '''
+    attempt = 1
+    while True:
+        try:
+            with stage(f'api {operation}'):
+                return getattr(client, operation)(**kwargs)
+        except Exception as e:
+            if classify_error(e) != RETRIABLE or attempt >= max_attempts:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            log(f'{operation} failed with {error_code(e)}, retrying in {delay:.1f}s (attempt {attempt}/{max_attempts})')
+            time.sleep(delay)
+            attempt += 1
+
+
+def write_dead_letter(operation, asset_id, region_name, error, kwargs, dead_letter_file_path=DEAD_LETTER_FILE_PATH):
+    '''
+    Appends a failed operation to the dead-letter file.
+    '''
+    entry = {
+        'operation': operation,
+        'asset_id': asset_id,
+        'region_name': region_name,
+        'kind': classify_error(error),
+        'error_code': error_code(error),
+        'error_message': str(error),
+        'failed_at': datetime.now(timezone.utc).isoformat(),
+        'kwargs': kwargs,
+    }
+    dead_letter_dir = os.path.dirname(dead_letter_file_path)
+    if dead_letter_dir:
+        os.makedirs(dead_letter_dir, exist_ok=True)
+    with open(dead_letter_file_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+
+def read_dead_letters(dead_letter_file_path=DEAD_LETTER_FILE_PATH):
+    '''
+    Returns the entries of the dead-letter file, or an empty list if it does not exist.
+    '''
+    if not os.path.exists(dead_letter_file_path):
+        return []
+    with open(dead_letter_file_path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _attempt(client, operation, kwargs):
+    try:
+        return call_with_retry(client, operation, **kwargs), None
+    except Exception as e:
+        return None, e
+
+
+def run_operation(client, operation, asset_id, region_name, dead_letter_file_path=DEAD_LETTER_FILE_PATH, **kwargs):
+    '''
+    Runs a QuickSight operation with retries, switching create_* to update_* when the asset already exists.
+    Failures that cannot be recovered in-process are written to the dead-letter file, except for delete_* operations.
+
+    Args:
+        client: The boto3 QuickSight client.
+        operation (str): The client method to call, e.g. create_data_set.
+        asset_id (str): The ID of the asset the operation acts on. Used for logging and the dead-letter entry.
+        region_name (str): The AWS region of the client. Recorded so the operation can be replayed.
+        dead_letter_file_path (str): The dead-letter file to append failures to, or None to not record them.
+        kwargs: The keyword arguments of the API call.
+
+    Return:
+        response (dict): The API response, or None if the operation failed.
+    '''
+    started = time.perf_counter()
+    if is_blocked(operation, kwargs):
+        error = DriftBlockedError(f'{asset_id} has drifted from the deployed state, re-record it with scan_drift.py --record')
+    else:
+        response, error = _attempt(client, operation, kwargs)
+        if error is not None and classify_error(error) == EXISTS and operation in UPDATE_OPERATIONS:
+            log(f'{asset_id} already exists, switching {operation} to {UPDATE_OPERATIONS[operation]}')
+            operation = UPDATE_OPERATIONS[operation]
+            response, error = _attempt(client, operation, kwargs)
+        if error is not None and operation.startswith('delete_') and error_code(error) == 'ResourceNotFoundException':
+            log(f'{asset_id} is already deleted')
+            response, error = {}, None
+        if error is None:
+            # The event comes first, so its duration is the call's and the manifest has it even if the bookkeeping fails.
+            emit_event(asset_id, operation, started, response=response, kwargs=kwargs)
+            mark_deployed(operation, kwargs, call=partial(call_with_retry, client))
+            forget_deleted(operation, kwargs)
+            record_deployed_lineage(operation, kwargs)
+            return response
+
+    log(f'Error while running {operation} for {asset_id} ({classify_error(error)}): {error}')
+    emit_event(asset_id, operation, started, error_code=error_code(error), kwargs=kwargs)
+    if dead_letter_file_path is not None and not operation.startswith('delete_'):
+        write_dead_letter(operation, asset_id, region_name, error, kwargs, dead_letter_file_path)
+    return None
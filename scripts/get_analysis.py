@@ -1,6 +1,7 @@
 import boto3
-from pprint import pformat
 import argparse
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_result, log
 
 '''
 This script queries and prints information for an analysis passed.
@@ -27,13 +28,17 @@ parser.add_argument('--region-name', '-r', type=str, required=True,
 parser.add_argument('--analysis-id', '-i', type=str, required=True,
                     help='The ID of the analysis')
 
+add_output_arguments(parser)
+add_profiling_arguments(parser)
 args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
 
 account_id = args.account_id
 region_name = args.region_name
 analysis_id = args.analysis_id
 
-print(f'Getting analysis {analysis_id}')
+log(f'Getting analysis {analysis_id}')
 
 client = boto3.client('quicksight', region_name=region_name)
 
@@ -41,4 +46,4 @@ response = client.describe_analysis(
     AwsAccountId=account_id,
     AnalysisId=analysis_id
 )
-print(pformat(response))
+print_result(response)
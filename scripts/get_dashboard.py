@@ -1,6 +1,7 @@
 import boto3
-from pprint import pformat
 import argparse
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_result, log
 
 '''
 This script queries and prints information for a dashboard passed.
@@ -27,13 +28,17 @@ parser.add_argument('--region-name', '-r', type=str, required=True,
 parser.add_argument('--dashboard-id', '-i', type=str, required=True,
                     help='The ID of the dashboard')
 
+add_output_arguments(parser)
+add_profiling_arguments(parser)
 args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
 
 account_id = args.account_id
 region_name = args.region_name
 dashboard_id = args.dashboard_id
 
-print(f'Getting dashboard {dashboard_id}')
+log(f'Getting dashboard {dashboard_id}')
 
 client = boto3.client('quicksight', region_name=region_name)
 
@@ -42,4 +47,4 @@ response = client.describe_dashboard(
     DashboardId=dashboard_id,
 )
 
-print(pformat(response))
+print_result(response)
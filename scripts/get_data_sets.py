@@ -3,6 +3,9 @@ from pprint import pformat
 import json
 import os
 import argparse
+import time
+from profiling import add_profiling_arguments, configure_profiling, stage
+from result_output import add_output_arguments, configure_output, emit_event, print_verbose, log
 
 '''
 This script fetches all datasets from a dashboard in QuickSight. 
@@ -16,7 +19,7 @@ Args:
     data_set_list (str []): The IDs of the data sets that needs to be migrated. The result has to be a list of string.
 
 Returns:
-    Saves 2 files per dataset in a self created folder called qs_extracts.
+    Saves 2 files per dataset in a self created folder called qs_extracts, and records each dataset ARN in the result manifest.
     The first file is the dataset information itself and the second file is the dataset permission information.
 
 Execution:
@@ -31,7 +34,11 @@ parser.add_argument('--region-name', '-r', type=str, required=True,
 parser.add_argument('--data-set-list', '-d', nargs='+', type=str, required=True,
                     help='The IDs of the data sets that needs to be migrated, seperated by a white space')
 
+add_output_arguments(parser)
+add_profiling_arguments(parser)
 args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
 
 source_account_id = args.source_account_id
 region_name = args.region_name
@@ -40,18 +47,19 @@ data_set_list = args.data_set_list
 next_token = None
 client = boto3.client('quicksight', region_name=region_name)
 
-print(f'DataSet IDs received are {pformat(data_set_list)}')
+log(f'DataSet IDs received are {pformat(data_set_list)}')
 
 for data_set_id in data_set_list:
+    started = time.perf_counter()
     resp = client.describe_data_set(
         AwsAccountId=source_account_id,
         DataSetId=data_set_id
     )
     dataset = resp['DataSet']
-    print(pformat(dataset))
+    print_verbose(dataset)
     # Create the folder if it doesn't exist
     os.makedirs('qs_extracts', exist_ok=True)
-    with open(f'qs_extracts/{data_set_id}_dataset.json', 'w', encoding='utf-8') as f:
+    with stage('json.dump extract'), open(f'qs_extracts/{data_set_id}_dataset.json', 'w', encoding='utf-8') as f:
         json.dump(dataset, f, ensure_ascii=False, indent=4, default=str)
 
     resp = client.describe_data_set_permissions(
@@ -59,6 +67,7 @@ for data_set_id in data_set_list:
         DataSetId=data_set_id
     )
     permissions = resp['Permissions']
-    with open(f'qs_extracts/{data_set_id}_dataset_permissions.json', 'w', encoding='utf-8') as f:
+    with stage('json.dump extract'), open(f'qs_extracts/{data_set_id}_dataset_permissions.json', 'w', encoding='utf-8') as f:
         json.dump(permissions, f, ensure_ascii=False, indent=4, default=str)
-    print(pformat(permissions))
+    print_verbose(permissions)
+    emit_event(data_set_id, 'describe_data_set', started, response=dataset, kwargs={'AwsAccountId': source_account_id})
@@ -1,6 +1,5 @@
 import boto3
-from pprint import pformat
-import json
+from result_output import print_result
 
 client = boto3.client('quicksight', region_name='us-west-2')
 
@@ -9,6 +8,6 @@ resp = client.describe_data_source(
     DataSourceId='138545a7-9a78-48bb-a35c-82c240a7edea'
 )
 
-print(pformat(resp))
+print_result(resp)
 
 
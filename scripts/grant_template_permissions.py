@@ -0,0 +1,172 @@
+import boto3
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from error_handling import call_with_retry, run_operation
+from rate_budget import RateBudget
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_verbose, log
+
+'''
+This script grants many target accounts access to many templates in one go (README step 5, Grant Permissions for Template).
+The current permissions of every template are kept in a local cache, so only the missing grants are computed and sent:
+at most one update_template_permissions call per template, covering all the target accounts that lack any of the actions.
+Calls are sent concurrently within a rate budget. Templates not yet in the cache are described once; pass --refresh-cache
+if permissions were changed outside of this script. The cache is keyed by account, region and template ID
+(e.g. 123456789012/us-west-2/template1), so one cache file can serve several source accounts and regions.
+A template whose permissions cannot be described is skipped; the permissions described for the others are still cached.
+For detailed explanation of the parameters, refer: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/quicksight/client/update_template_permissions.html
+Note: Ensure active credentials for the source account before executing this script.
+
+Args:
+    source_account_id (str): The AWS account ID of the source environment, where the templates are.
+    region_name (str): The AWS region where QuickSight is deployed.
+    template_ids (str []): The IDs of the templates to share.
+    target_account_ids (str []): The AWS account IDs to grant access to.
+    permissions_file_path (str): Optional. The file with the actions to grant. Defaults to ./TemplatePermissions.json;
+        its Principal is replaced by arn:aws:iam::<target_account_id>:root for every target account.
+    cache_file_path (str): Optional. The template permissions cache. Defaults to qs_extracts/template_permissions_cache.json.
+    refresh_cache (bool): Optional. Describe the permissions of every template again instead of using the cache.
+    calls_per_second (float): Optional. The rate budget for QuickSight calls. Defaults to 2.
+    max_workers (int): Optional. The number of calls sent in parallel. Defaults to 8.
+    dry_run (bool): Optional. Only print the missing grants.
+
+Return:
+    Exits with 1 if any template could not be described or any grant failed.
+
+Execution:
+    python grant_template_permissions.py --source-account-id 123456789012 --region-name us-west-2 \
+    --template-ids template1 template2 --target-account-ids 210987654321 345678901234
+'''
+
+parser = argparse.ArgumentParser(description='Grant target accounts access to QuickSight templates')
+parser.add_argument('--source-account-id', '-s', type=str, required=True,
+                    help='The AWS account ID of the source environment, where the templates are')
+parser.add_argument('--region-name', '-r', type=str, required=True,
+                    help='The AWS region where QuickSight is deployed')
+parser.add_argument('--template-ids', '-i', nargs='+', type=str, required=True,
+                    help='The IDs of the templates to share, seperated by a white space')
+parser.add_argument('--target-account-ids', '-t', nargs='+', type=str, required=True,
+                    help='The AWS account IDs to grant access to, seperated by a white space')
+parser.add_argument('--permissions-file-path', '-p', type=str, default='./TemplatePermissions.json',
+                    help='The file with the actions to grant')
+parser.add_argument('--cache-file-path', '-c', type=str, default='qs_extracts/template_permissions_cache.json',
+                    help='The template permissions cache')
+parser.add_argument('--refresh-cache', action='store_true',
+                    help='Describe the permissions of every template again instead of using the cache')
+parser.add_argument('--calls-per-second', type=float, default=2,
+                    help='The rate budget for QuickSight calls')
+parser.add_argument('--max-workers', '-w', type=int, default=8,
+                    help='The number of calls sent in parallel')
+parser.add_argument('--dry-run', action='store_true',
+                    help='Only print the missing grants')
+
+add_output_arguments(parser)
+add_profiling_arguments(parser)
+args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
+
+source_account_id = args.source_account_id
+region_name = args.region_name
+template_ids = args.template_ids
+target_account_ids = args.target_account_ids
+cache_file_path = args.cache_file_path
+
+# update_template_permissions accepts at most 100 grants per call.
+MAX_GRANTS_PER_CALL = 100
+
+with open(args.permissions_file_path) as permissions_file:
+    actions = sorted({action for permission in json.load(permissions_file) for action in permission['Actions']})
+
+cache = {}
+if os.path.exists(cache_file_path) and not args.refresh_cache:
+    with open(cache_file_path, encoding='utf-8') as cache_file:
+        cache = json.load(cache_file)
+
+client = boto3.client('quicksight', region_name=region_name)
+budget = RateBudget(args.calls_per_second)
+
+
+def parallel(function, items):
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        return list(executor.map(function, items))
+
+
+def cache_key(template_id):
+    return f'{source_account_id}/{region_name}/{template_id}'
+
+
+def describe_permissions(template_id):
+    budget.acquire()
+    try:
+        response = call_with_retry(client, 'describe_template_permissions', AwsAccountId=source_account_id, TemplateId=template_id)
+    except Exception as e:
+        log(f'Could not describe the permissions of {template_id}, skipping it: {e}')
+        return None
+    return response['Permissions']
+
+
+def cache_permissions(template_id, permissions):
+    cache[cache_key(template_id)] = {'Permissions': permissions, 'CachedAt': datetime.now(timezone.utc).isoformat()}
+
+
+def missing_grants(permissions):
+    granted = {}
+    for permission in permissions:
+        granted.setdefault(permission['Principal'], set()).update(permission['Actions'])
+    grants = []
+    for target_account_id in target_account_ids:
+        principal = f'arn:aws:iam::{target_account_id}:root'
+        missing = [action for action in actions if action not in granted.get(principal, set())]
+        if missing:
+            grants.append({'Principal': principal, 'Actions': missing})
+    return grants
+
+
+def grant(call):
+    template_id, grants = call
+    budget.acquire()
+    response = run_operation(client, 'update_template_permissions', template_id, region_name,
+                             AwsAccountId=source_account_id, TemplateId=template_id, GrantPermissions=grants)
+    if response is not None:
+        cache_permissions(template_id, response['Permissions'])
+        print_verbose(response)
+    return response is not None
+
+
+uncached = [template_id for template_id in template_ids if cache_key(template_id) not in cache]
+log(f'{len(template_ids) - len(uncached)} templates cached, describing permissions of {len(uncached)}')
+undescribed = []
+for template_id, permissions in zip(uncached, parallel(describe_permissions, uncached)):
+    if permissions is None:
+        undescribed.append(template_id)
+    else:
+        cache_permissions(template_id, permissions)
+
+calls = []
+for template_id in template_ids:
+    if template_id in undescribed:
+        continue
+    grants = missing_grants(cache[cache_key(template_id)]['Permissions'])
+    for i in range(0, len(grants), MAX_GRANTS_PER_CALL):
+        calls.append((template_id, grants[i:i + MAX_GRANTS_PER_CALL]))
+
+log(f'{len(calls)} calls needed for {len(template_ids)} templates and {len(target_account_ids)} target accounts')
+for template_id, grants in calls:
+    log(f"{template_id}: {', '.join(grant['Principal'] for grant in grants)}")
+
+succeeded = 0 if args.dry_run else sum(parallel(grant, calls))
+
+os.makedirs(os.path.dirname(cache_file_path) or '.', exist_ok=True)
+with open(cache_file_path, 'w', encoding='utf-8') as cache_file:
+    json.dump(cache, cache_file, ensure_ascii=False, indent=4)
+
+if not args.dry_run:
+    log(f'Granted permissions with {succeeded} of {len(calls)} calls')
+if undescribed:
+    log(f"Skipped {len(undescribed)} templates whose permissions could not be described: {', '.join(undescribed)}")
+if undescribed or (not args.dry_run and succeeded < len(calls)):
+    raise SystemExit(1)
@@ -0,0 +1,216 @@
+import atexit
+import copy
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from profiling import stage
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+'''
+JSON files shared by every operation of the scripts: the deploy state, the result manifest and the lineage index.
+Each file is a snapshot plus a journal of changes next to it (e.g. qs_extracts/deploy_state.json and qs_extracts/deploy_state.jsonl).
+A change appends one JSON line to the journal, so an operation costs the size of its change, not of the whole file.
+Each process keeps the document in memory and only reads the journal lines added since its last read.
+When the journal grows past COMPACT_BYTES, and when a process that wrote to it exits, it is folded into the snapshot and emptied,
+so the JSON file can be read directly (e.g. with jq) after a script finished.
+Reads and writes hold a lock on <file>.lock (flock, or msvcrt.locking on Windows, where reads lock exclusively too), so
+scripts running at the same time see and keep each other's changes.
+
+Journal line:
+    {"Section": "Assets", "Key": "123456789012/DataSet/dataset1", "Value": {...}, "Merge": false}
+    A null Value removes the key. With Merge, the Value fields are merged into the current value.
+
+Usage:
+    store = JsonStore.at('qs_extracts/deploy_state.json', ('Assets',))
+    store.set('Assets', key, entry)
+    store.get('Assets', key)
+    document = store.load()
+'''
+
+COMPACT_BYTES = 4 * 2 ** 20
+
+
+def _lock_file(lock_file, shared):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            # LK_LOCK gives up after about 10 seconds; keep waiting like flock does.
+            continue
+
+
+def _unlock_file(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class JsonStore:
+    '''
+    A JSON document made of sections ({section: {key: value}}), shared between threads and processes.
+    '''
+
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, file_path, sections):
+        self.file_path = file_path
+        self.journal_file_path = f'{os.path.splitext(file_path)[0]}.jsonl'
+        self.lock_file_path = f'{file_path}.lock'
+        self.sections = sections
+        self._lock = threading.RLock()
+        self._document = None
+        self._snapshot_signature = None
+        self._offset = 0
+        self._written = False
+
+    @classmethod
+    def at(cls, file_path, sections):
+        '''
+        Returns the store of a file, shared by every caller in the process.
+        '''
+        with cls._stores_lock:
+            if file_path not in cls._stores:
+                cls._stores[file_path] = cls(file_path, sections)
+                atexit.register(cls._stores[file_path].flush)
+            return cls._stores[file_path]
+
+    @contextmanager
+    def _locked(self, shared=False):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+            with open(self.lock_file_path, 'a') as lock_file:
+                _lock_file(lock_file, shared)
+                try:
+                    yield self._refresh()
+                finally:
+                    _unlock_file(lock_file)
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        signature = self._signature()
+        journal_size = os.path.getsize(self.journal_file_path) if os.path.exists(self.journal_file_path) else 0
+        if self._document is None or signature != self._snapshot_signature or journal_size < self._offset:
+            self._document = {section: {} for section in self.sections}
+            if signature is not None:
+                with open(self.file_path, encoding='utf-8') as f:
+                    self._document.update(json.load(f))
+            self._snapshot_signature = signature
+            self._offset = 0
+        if journal_size > self._offset:
+            with open(self.journal_file_path, 'rb') as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # A line still being written by another process; read it next time.
+                        break
+                    self._offset += len(line)
+                    if line.strip():
+                        self._apply(json.loads(line))
+        return self._document
+
+    def _apply(self, change):
+        values = self._document.setdefault(change['Section'], {})
+        if change['Value'] is None:
+            values.pop(change['Key'], None)
+        elif change.get('Merge') and isinstance(values.get(change['Key']), dict):
+            values[change['Key']] = dict(values[change['Key']], **change['Value'])
+        else:
+            values[change['Key']] = change['Value']
+
+    def _append(self, changes):
+        if not changes:
+            return
+        lines = ''.join(json.dumps(change, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+                        for change in changes)
+        with stage(f'write {os.path.basename(self.journal_file_path)}'):
+            with open(self.journal_file_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                size = f.tell()
+        self._written = True
+        # Apply through the journal, so values are stored exactly as other processes read them.
+        self._refresh()
+        if size > COMPACT_BYTES:
+            self._compact()
+
+    def _compact(self):
+        temp_file_path = f'{self.file_path}.tmp'
+        with stage(f'compact {os.path.basename(self.file_path)}'), open(temp_file_path, 'w', encoding='utf-8') as f:
+            json.dump(self._document, f, ensure_ascii=False, indent=4, default=str)
+        os.replace(temp_file_path, self.file_path)
+        open(self.journal_file_path, 'w').close()
+        self._snapshot_signature = self._signature()
+        self._offset = 0
+
+    def flush(self):
+        '''
+        Folds the journal into the snapshot if this process wrote to it. Registered to run at exit.
+        '''
+        if not self._written:
+            return
+        with self._locked():
+            if self._offset:
+                self._compact()
+        self._written = False
+
+    def load(self):
+        '''
+        Returns a copy of the whole document.
+        '''
+        with self._locked(shared=True) as document:
+            return copy.deepcopy(document)
+
+    def get(self, section, key):
+        with self._locked(shared=True) as document:
+            return copy.deepcopy(document.get(section, {}).get(key))
+
+    def set(self, section, key, value, merge=False):
+        '''
+        Sets a value, or removes the key if value is None. With merge, the fields of value are merged into the current value.
+        '''
+        with self._locked():
+            self._append([{'Section': section, 'Key': key, 'Value': value, 'Merge': merge}])
+
+    def modify(self, section, key, function):
+        '''
+        Replaces a value with function(current value or None), atomically across processes. None removes the key.
+        '''
+        with self._locked() as document:
+            current = copy.deepcopy(document.get(section, {}).get(key))
+            self._append([{'Section': section, 'Key': key, 'Value': function(current), 'Merge': False}])
+
+    def save(self, document, base):
+        '''
+        Writes the changes made to a loaded document, base being the document as it was loaded.
+        Keys changed by other processes since the load are kept unless the same key was changed here.
+        '''
+        changes = []
+        for section in self.sections:
+            values, base_values = document.get(section, {}), base.get(section, {})
+            changes += [{'Section': section, 'Key': key, 'Value': value, 'Merge': False}
+                        for key, value in values.items() if base_values.get(key) != value]
+            changes += [{'Section': section, 'Key': key, 'Value': None, 'Merge': False}
+                        for key in base_values if key not in values]
+        with self._locked():
+            self._append(changes)
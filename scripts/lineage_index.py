@@ -0,0 +1,226 @@
+from json_store import JsonStore
+
+'''
+Dataset-to-dashboard lineage index, used to redeploy only the assets that depend on a changed dataset.
+The index records, for every asset, the assets it is built from:
+    DataSet: its parent datasets (LogicalTableMap sources with a DataSetArn) and its output columns.
+    Template, Analysis, Dashboard: the datasets in their dataset references, the source template or analysis, and,
+    when a definition was scanned, the columns used per dataset.
+Assets are keyed by type and ID (e.g. DataSet/dataset1), so source and target account ARNs of the same asset match.
+The accounts an asset was deployed to by run_operation are recorded with it; entries read from extracts have none.
+The index is updated incrementally: build_lineage.py re-reads only changed extract files, and run_operation records
+the lineage of every asset it deploys. A deletion only removes its account from the asset, and the asset once no
+deployed account is left, so deleting a test copy keeps the lineage recorded for production.
+
+Index file (qs_extracts/lineage_index.json, with its journal qs_extracts/lineage_index.jsonl, see json_store.py):
+    {"Files": {"qs_extracts/dataset1_dataset.json": {"MTime": 0.0, "Size": 0}},
+     "Assets": {"DataSet/dataset1": {"Upstream": ["DataSet/parent"], "Columns": ["a"], "References": {}, "ColumnsUsed": null,
+                                     "Accounts": ["123456789012"]}}}
+'''
+
+INDEX_FILE_PATH = 'qs_extracts/lineage_index.json'
+
+DEPLOY_ORDER = ('DataSet', 'Template', 'Analysis', 'Dashboard')
+
+# The asset type and ID parameter of every operation that records lineage.
+LINEAGE_OPERATIONS = {
+    'create_data_set': ('DataSet', 'DataSetId'),
+    'update_data_set': ('DataSet', 'DataSetId'),
+    'create_template': ('Template', 'TemplateId'),
+    'update_template': ('Template', 'TemplateId'),
+    'create_analysis': ('Analysis', 'AnalysisId'),
+    'update_analysis': ('Analysis', 'AnalysisId'),
+    'create_dashboard': ('Dashboard', 'DashboardId'),
+    'update_dashboard': ('Dashboard', 'DashboardId'),
+}
+
+# The asset type and ID parameter of every operation that removes an asset from the index.
+DELETE_OPERATIONS = {
+    'delete_data_set': ('DataSet', 'DataSetId'),
+    'delete_template': ('Template', 'TemplateId'),
+    'delete_analysis': ('Analysis', 'AnalysisId'),
+    'delete_dashboard': ('Dashboard', 'DashboardId'),
+}
+
+ARN_RESOURCE_TYPES = {
+    'dataset': 'DataSet',
+    'template': 'Template',
+    'analysis': 'Analysis',
+    'dashboard': 'Dashboard',
+}
+
+
+def arn_key(arn):
+    '''
+    Returns the index key of an ARN, e.g. arn:aws:quicksight:us-west-2:123456789012:dataset/dataset1 -> DataSet/dataset1.
+    '''
+    resource = arn.split(':', 5)[-1]
+    resource_type, _, resource_id = resource.partition('/')
+    return f'{ARN_RESOURCE_TYPES.get(resource_type, resource_type)}/{resource_id.split("/")[0]}'
+
+
+def _store(index_file_path):
+    return JsonStore.at(index_file_path, ('Files', 'Assets'))
+
+
+def load_index(index_file_path=INDEX_FILE_PATH):
+    return _store(index_file_path).load()
+
+
+def save_index(index, base, index_file_path=INDEX_FILE_PATH):
+    '''
+    Writes the entries changed since the index was loaded as base, keeping changes made meanwhile by other runs.
+    '''
+    _store(index_file_path).save(index, base)
+
+
+def set_asset(index, key, upstream, columns=None, references=None, columns_used=None):
+    '''
+    Replaces the lineage of an asset. Columns used per dataset are kept for datasets that are still upstream,
+    unless new ones are passed.
+    '''
+    previous = index['Assets'].get(key, {})
+    if columns_used is None and previous.get('ColumnsUsed') is not None:
+        columns_used = {dataset: used for dataset, used in previous['ColumnsUsed'].items() if dataset in upstream}
+    index['Assets'][key] = {
+        'Upstream': sorted(set(upstream)),
+        'Columns': columns if columns is not None else previous.get('Columns'),
+        'References': references if references is not None else previous.get('References', {}),
+        'ColumnsUsed': columns_used,
+        'Accounts': previous.get('Accounts', []),
+    }
+
+
+def dataset_upstream(logical_table_map):
+    return [arn_key(table['Source']['DataSetArn']) for table in (logical_table_map or {}).values()
+            if 'DataSetArn' in table.get('Source', {})]
+
+
+def record_dataset(index, dataset):
+    '''
+    Records the lineage of an extracted dataset (the DataSet of describe_data_set).
+    '''
+    columns = sorted(column['Name'] for column in dataset.get('OutputColumns', []))
+    set_asset(index, f"DataSet/{dataset['DataSetId']}", dataset_upstream(dataset.get('LogicalTableMap')), columns=columns)
+
+
+def record_references(index, key, dataset_references, source_arn=None):
+    '''
+    Records the lineage of a template, analysis or dashboard from its dataset references
+    ([{"DataSetPlaceholder": ..., "DataSetArn": ...}]) and the ARN of the template or analysis it is built from.
+    '''
+    references = {reference['DataSetPlaceholder']: arn_key(reference['DataSetArn']) for reference in dataset_references}
+    upstream = list(references.values()) + ([arn_key(source_arn)] if source_arn else [])
+    set_asset(index, key, upstream, references=references)
+
+
+def _column_identifiers(node):
+    if isinstance(node, dict):
+        if 'DataSetIdentifier' in node and 'ColumnName' in node:
+            yield node['DataSetIdentifier'], node['ColumnName']
+        for value in node.values():
+            yield from _column_identifiers(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _column_identifiers(value)
+
+
+def record_definition(index, key, definition):
+    '''
+    Records the columns used per dataset by a template, analysis or dashboard definition.
+    Dataset identifiers are resolved with the DataSetIdentifierDeclarations of the definition, or else with the
+    dataset references recorded for the asset.
+    '''
+    entry = index['Assets'].get(key, {})
+    identifiers = dict(entry.get('References', {}))
+    for declaration in definition.get('DataSetIdentifierDeclarations', []):
+        identifiers[declaration['Identifier']] = arn_key(declaration['DataSetArn'])
+    columns_used = {}
+    for identifier, column_name in _column_identifiers(definition):
+        if identifier in identifiers:
+            columns_used.setdefault(identifiers[identifier], set()).add(column_name)
+    upstream = set(entry.get('Upstream', [])) | set(identifiers.values())
+    set_asset(index, key, upstream, columns_used={dataset: sorted(used) for dataset, used in columns_used.items()})
+
+
+def record_deployed_lineage(operation, kwargs, index_file_path=INDEX_FILE_PATH):
+    '''
+    Records the lineage of an asset deployed by run_operation, using the keyword arguments of the API call, and the account
+    it was deployed to. A deletion removes the account from the asset, and the asset once it has no deployed account left.
+    '''
+    store = _store(index_file_path)
+    account_id = kwargs.get('AwsAccountId')
+    if operation in DELETE_OPERATIONS:
+        asset_type, id_key = DELETE_OPERATIONS[operation]
+        key = f'{asset_type}/{kwargs[id_key]}'
+        entry = store.get('Assets', key)
+        if entry is None or account_id not in entry.get('Accounts', []):
+            return
+
+        def forget(previous):
+            accounts = [account for account in previous.get('Accounts', []) if account != account_id]
+            return dict(previous, Accounts=accounts) if accounts else None
+
+        store.modify('Assets', key, forget)
+        return
+    if operation not in LINEAGE_OPERATIONS:
+        return
+    asset_type, id_key = LINEAGE_OPERATIONS[operation]
+    key = f'{asset_type}/{kwargs[id_key]}'
+
+    def update(previous):
+        # set_asset keeps parts of the previous entry, so it runs on an index holding only that entry.
+        index = {'Assets': {key: previous} if previous is not None else {}}
+        if asset_type == 'DataSet':
+            set_asset(index, key, dataset_upstream(kwargs.get('LogicalTableMap')))
+        else:
+            source_entity = kwargs.get('SourceEntity', {})
+            source = source_entity.get('SourceTemplate') or source_entity.get('SourceAnalysis') or {}
+            record_references(index, key, source.get('DataSetReferences', []), source.get('Arn'))
+        entry = index['Assets'][key]
+        entry['Accounts'] = sorted(set(entry['Accounts']) | {account_id})
+        return entry
+
+    store.modify('Assets', key, update)
+
+
+def downstream_assets(index, data_set_ids, columns=None):
+    '''
+    Returns the minimal set of assets to redeploy after the given datasets changed.
+
+    Args:
+        index (dict): The lineage index.
+        data_set_ids (str []): The IDs of the changed datasets.
+        columns (str []): Optional. Only these columns changed. Assets whose scanned definition uses none of them
+            are skipped; assets without a scanned definition are always included. Datasets built on a changed dataset
+            are always included, with all their columns.
+
+    Return:
+        assets (dict): {asset type: [asset IDs]} for DataSet, Template, Analysis and Dashboard, in deploy order.
+    '''
+    downstream = {}
+    for key, entry in index['Assets'].items():
+        for upstream in entry['Upstream']:
+            downstream.setdefault(upstream, []).append(key)
+
+    affected = set()
+    # (asset key, changed columns or None for every column)
+    queue = [(f'DataSet/{data_set_id}', set(columns) if columns else None) for data_set_id in data_set_ids]
+    while queue:
+        key, changed_columns = queue.pop()
+        if key in affected:
+            continue
+        affected.add(key)
+        for child in downstream.get(key, []):
+            if child in affected:
+                continue
+            columns_used = (index['Assets'][child].get('ColumnsUsed') or {}).get(key)
+            if child.startswith('DataSet/') or changed_columns is None or columns_used is None \
+                    or changed_columns & set(columns_used):
+                queue.append((child, None))
+
+    assets = {asset_type: [] for asset_type in DEPLOY_ORDER}
+    for key in sorted(affected):
+        asset_type, _, asset_id = key.partition('/')
+        assets.setdefault(asset_type, []).append(asset_id)
+    return assets
@@ -0,0 +1,260 @@
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import botocore.session
+from botocore import xform_name
+from asset_models import DataSet
+from profiling import stage
+from result_output import MANIFEST_FILE_PATH, load_manifest
+
+'''
+Offline pre-flight validation of QuickSight requests against the botocore service model, which ships with boto3.
+No network calls are made. Every request is checked for:
+    required members, unknown members and exactly one member of union structures (e.g. a PhysicalTable source),
+    enum values, string patterns, string and list lengths, map entry counts (e.g. at most 32 PhysicalTableMap tables),
+    and number ranges.
+The ARNs a request references are checked against the mapping: they must be in the expected account and region, and
+be known, either from the batch being validated or from the result manifest of earlier runs.
+
+Usage:
+    errors = validate_request('create_data_set', kwargs)
+    errors = validate_arns('create_data_set', kwargs, known_arns(), target_account_id, region_name)
+    errors = preflight_data_sets('create_data_set', target_account_id, region_name, data_set_ids, data_source_arn)
+'''
+
+ARN_PATTERN = re.compile(r'^arn:[^:]+:quicksight:(?P<region>[^:]*):(?P<account>[^:]*):(?P<type>[^/]+)/(?P<id>.+)$')
+
+_service_model = None
+_operation_names = None
+_known = None
+
+
+def service_model():
+    global _service_model, _operation_names
+    if _service_model is None:
+        _service_model = botocore.session.get_session().get_service_model('quicksight')
+        _operation_names = {xform_name(name): name for name in _service_model.operation_names}
+    return _service_model
+
+
+def validate_request(operation, kwargs):
+    '''
+    Validates the keyword arguments of a boto3 QuickSight call against the service model.
+
+    Args:
+        operation (str): The client method, e.g. create_data_set.
+        kwargs (dict): The keyword arguments of the call.
+
+    Return:
+        errors (str []): One message per problem, each prefixed with the path of the offending value.
+    '''
+    model = service_model()
+    input_shape = model.operation_model(_operation_names[operation]).input_shape
+    errors = []
+    _validate(kwargs, input_shape, operation, errors)
+    return errors
+
+
+def _validate(value, shape, path, errors):
+    metadata = shape.metadata
+    type_name = shape.type_name
+    if type_name == 'structure':
+        if not isinstance(value, dict):
+            errors.append(f'{path}: expected an object')
+            return
+        for name in shape.required_members:
+            if value.get(name) is None:
+                errors.append(f'{path}.{name}: required member is missing')
+        for name, member in value.items():
+            if name not in shape.members:
+                errors.append(f'{path}.{name}: unknown member')
+            elif member is not None:
+                _validate(member, shape.members[name], f'{path}.{name}', errors)
+        if metadata.get('union') and len([name for name, member in value.items() if member is not None]) != 1:
+            errors.append(f'{path}: exactly one of {", ".join(shape.members)} must be set')
+    elif type_name == 'list':
+        if not isinstance(value, list):
+            errors.append(f'{path}: expected a list')
+            return
+        _check_size(len(value), metadata, path, 'items', errors)
+        for i, item in enumerate(value):
+            _validate(item, shape.member, f'{path}[{i}]', errors)
+    elif type_name == 'map':
+        if not isinstance(value, dict):
+            errors.append(f'{path}: expected an object')
+            return
+        _check_size(len(value), metadata, path, 'entries', errors)
+        for key, item in value.items():
+            _validate(key, shape.key, f'{path} key {key!r}', errors)
+            _validate(item, shape.value, f'{path}[{key!r}]', errors)
+    elif type_name == 'string':
+        if not isinstance(value, str):
+            errors.append(f'{path}: expected a string')
+            return
+        if shape.enum and value not in shape.enum:
+            errors.append(f'{path}: {value!r} is not one of {", ".join(shape.enum)}')
+        _check_size(len(value), metadata, path, 'characters', errors)
+        if 'pattern' in metadata and not _matches(metadata['pattern'], value):
+            errors.append(f'{path}: {value!r} does not match {metadata["pattern"]}')
+    elif type_name in ('integer', 'long', 'double', 'float'):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f'{path}: expected a number')
+            return
+        if 'min' in metadata and value < metadata['min']:
+            errors.append(f'{path}: {value} is below the minimum of {metadata["min"]}')
+        if 'max' in metadata and value > metadata['max']:
+            errors.append(f'{path}: {value} is above the maximum of {metadata["max"]}')
+    elif type_name == 'boolean' and not isinstance(value, bool):
+        errors.append(f'{path}: expected a boolean')
+
+
+def _check_size(size, metadata, path, unit, errors):
+    if 'min' in metadata and size < metadata['min']:
+        errors.append(f'{path}: {size} {unit}, at least {metadata["min"]} required')
+    if 'max' in metadata and size > metadata['max']:
+        errors.append(f'{path}: {size} {unit}, at most {metadata["max"]} allowed')
+
+
+def _matches(pattern, value):
+    try:
+        return re.fullmatch(pattern.strip('^$'), value, re.DOTALL) is not None
+    except re.error:
+        # Java-only constructs such as \p{...}; botocore does not enforce patterns either.
+        return True
+
+
+def quicksight_arn(region_name, account_id, resource_type, resource_id):
+    return f'arn:aws:quicksight:{region_name}:{account_id}:{resource_type}/{resource_id}'
+
+
+def known_arns(manifest_file_path=MANIFEST_FILE_PATH):
+    '''
+    Returns the ARNs of the assets whose last operation recorded in the result manifest succeeded and was not a deletion.
+    '''
+    return {result['arn'] for result in load_manifest(manifest_file_path)['Results'].values()
+            if result.get('arn') and result.get('status') == 'succeeded' and not result['action'].startswith('delete_')}
+
+
+def referenced_arns(kwargs):
+    '''
+    Returns (path, ARN) for every data source, dataset, template and analysis ARN referenced by a request.
+    '''
+    found = []
+
+    def walk(node, path):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in ('DataSourceArn', 'DataSetArn', 'Arn') and isinstance(value, str):
+                    found.append((f'{path}.{key}', value))
+                else:
+                    walk(value, f'{path}.{key}')
+        elif isinstance(node, list):
+            for i, value in enumerate(node):
+                walk(value, f'{path}[{i}]')
+
+    walk(kwargs, '')
+    return found
+
+
+def validate_arns(operation, kwargs, known, account_id, region_name):
+    '''
+    Checks that every ARN referenced by a request is well formed, in the account and region the request is sent to,
+    and known from the batch or the result manifest.
+    Template ARNs only need to be in the same region, as templates are shared from the source account.
+    The source analysis of a template is not checked against the mapping, as it is never migrated itself.
+    '''
+    errors = []
+    for path, arn in referenced_arns(kwargs):
+        match = ARN_PATTERN.match(arn)
+        if not match:
+            errors.append(f'{operation}{path}: {arn!r} is not a QuickSight ARN')
+            continue
+        if match['region'] != region_name:
+            errors.append(f'{operation}{path}: {arn} is not in region {region_name}')
+        elif match['account'] != account_id and match['type'] != 'template':
+            errors.append(f'{operation}{path}: {arn} is not in account {account_id}')
+        if arn not in known and match['type'] != 'analysis':
+            errors.append(f'{operation}{path}: {arn} is not in the mapping (batch or result manifest)')
+    return errors
+
+
+def _start_worker(known):
+    global _known
+    _known = known
+    service_model()
+
+
+def _validate_built(request):
+    label, operation, account_id, region_name, kwargs = request
+    try:
+        kwargs = kwargs() if callable(kwargs) else kwargs
+    except Exception as e:
+        return label, [f'could not build the request: {e}']
+    return label, validate_request(operation, kwargs) + validate_arns(operation, kwargs, _known, account_id, region_name)
+
+
+def validate_all(requests, known, max_workers=None):
+    '''
+    Validates a batch of requests in parallel worker processes, as the validation is CPU-bound.
+    Workers are only used where the platform starts them with fork (Linux). Spawned workers would re-run the top-level code of
+    the calling script, so elsewhere (Windows, macOS) the batch is validated in this process.
+
+    Args:
+        requests (list): (label, operation, account ID, region name, kwargs or a callable returning them) per request.
+            A callable lets the request be built (e.g. read from an extract file) inside the worker. It must be picklable:
+            a module-level function or a functools.partial of one, not a lambda.
+        known (set): The ARNs in the mapping.
+        max_workers (int): The number of worker processes. Defaults to the number of CPUs. Ignored without fork.
+
+    Return:
+        errors (dict): {label: [messages]} for every request with at least one problem.
+    '''
+    max_workers = min(max_workers or os.cpu_count(), len(requests))
+    with stage('preflight validation'):
+        if max_workers <= 1 or multiprocessing.get_start_method() != 'fork':
+            _start_worker(known)
+            results = [_validate_built(request) for request in requests]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_start_worker, initargs=(known,)) as executor:
+                results = list(executor.map(_validate_built, requests, chunksize=max(1, len(requests) // (4 * max_workers))))
+    return {label: errors for label, errors in results if errors}
+
+
+def data_set_request(extracts_dir, data_set_id, account_id, data_source_arn):
+    return DataSet.from_file(f'{extracts_dir}/{data_set_id}_dataset.json').request(account_id, data_source_arn)
+
+
+def template_request(fields, source_key, source_arn, references_file_path):
+    '''
+    Returns the request of a template, analysis or dashboard built from source_key (SourceAnalysis or SourceTemplate).
+    '''
+    with open(references_file_path) as dataset_references_file:
+        references = json.load(dataset_references_file)
+    return dict(fields, SourceEntity={source_key: {'Arn': source_arn, 'DataSetReferences': references}})
+
+
+def data_set_requests(operation, account_id, region_name, data_set_ids, data_source_arn, extracts_dir='qs_extracts'):
+    '''
+    Returns the validate_all requests of the data sets create_data_set.py or update_data_set.py are about to send.
+    '''
+    return [(f'dataset/{data_set_id}', operation, account_id, region_name,
+             partial(data_set_request, extracts_dir, data_set_id, account_id, data_source_arn)) for data_set_id in data_set_ids]
+
+
+def preflight_data_sets(operation, account_id, region_name, data_set_ids, data_source_arn):
+    '''
+    Validates every data set request of a batch before the first one is sent. The data source ARN and the data sets of the
+    batch are part of the mapping.
+    '''
+    known = known_arns() | {data_source_arn}
+    known |= {quicksight_arn(region_name, account_id, 'dataset', data_set_id) for data_set_id in data_set_ids}
+    return validate_all(data_set_requests(operation, account_id, region_name, data_set_ids, data_source_arn), known)
+
+
+def print_errors(errors):
+    for label, messages in errors.items():
+        print(json.dumps({'asset': label, 'status': 'invalid', 'errors': messages}, ensure_ascii=False))
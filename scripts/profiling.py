@@ -0,0 +1,175 @@
+import atexit
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+'''
+Opt-in profiling of the local work done by the migration scripts (parsing extracts, rewriting PhysicalTableMap,
+pretty-printing, writing files) next to the time spent in QuickSight calls.
+Code marks its stages with `with stage('name'):`. When profiling is on, every stage records:
+    wall and CPU time (--profile),
+    tracemalloc peak and net allocated memory (--profile-memory),
+    a cProfile of the stage, written to <stage>.prof in the profile folder (--profile-cprofile).
+At exit a summary table ranks the stages by wall time, and the summary is written to summary.json in the profile folder
+(qs_extracts/profiles/<script>_<timestamp> by default). QuickSight calls are recorded as "api <operation>" stages.
+Scripts without these arguments can be profiled with the QS_PROFILE environment variable, e.g. QS_PROFILE=memory,cprofile.
+A nested stage is also counted in the stage around it, so the "local %" column can add up to more than 100.
+The peak of a stage is the highest traced memory of the process while the stage ran, above its memory at the start, including
+the peaks of the stages nested in it. Stages in parallel threads share the process: their CPU time and peak memory include the
+work of the other threads, and only one cProfile runs at a time.
+
+Usage in a script:
+    add_profiling_arguments(parser)
+    args = parser.parse_args()
+    configure_profiling(args)
+'''
+
+settings = {
+    'enabled': False,
+    'memory': False,
+    'cprofile': False,
+    'profile_dir': None,
+}
+
+_stats = {}
+_profilers = {}
+# The highest traced memory seen by every stage in progress, kept across the peak resets of the stages starting inside them.
+_open_peaks = []
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def add_profiling_arguments(parser):
+    parser.add_argument('--profile', action='store_true',
+                        help='Time the local stages and print a summary at exit')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Also record the tracemalloc peak memory of each stage (slower)')
+    parser.add_argument('--profile-cprofile', action='store_true',
+                        help='Also write a cProfile of each stage to the profile folder')
+    parser.add_argument('--profile-dir', type=str,
+                        help='The profile folder. Defaults to qs_extracts/profiles/<script>_<timestamp>')
+
+
+def configure_profiling(args=None, modes=None):
+    '''
+    Turns profiling on from the script arguments, or from a set of modes ('timers', 'memory', 'cprofile').
+    '''
+    modes = set(modes or ())
+    if args is not None:
+        modes |= {mode for mode, on in (('timers', args.profile), ('memory', args.profile_memory),
+                                        ('cprofile', args.profile_cprofile)) if on}
+    if not modes or settings['enabled']:
+        return
+    script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+    default_dir = os.path.join('qs_extracts', 'profiles', f'{script}_{datetime.now():%Y%m%d_%H%M%S}')
+    settings['enabled'] = True
+    settings['memory'] = 'memory' in modes
+    settings['cprofile'] = 'cprofile' in modes
+    settings['profile_dir'] = getattr(args, 'profile_dir', None) or default_dir
+    if settings['memory']:
+        tracemalloc.start()
+    atexit.register(print_summary)
+
+
+@contextmanager
+def stage(name):
+    '''
+    Records the wall time, CPU time, memory and cProfile of a stage when profiling is on. Free when it is off.
+    '''
+    if not settings['enabled']:
+        yield
+        return
+
+    profiler = _start_cprofile(name) if settings['cprofile'] else None
+    if settings['memory']:
+        memory_before, open_peak = _start_peak()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        peak = allocated = 0
+        if settings['memory']:
+            current, peak = _end_peak(open_peak)
+            allocated = current - memory_before
+            peak -= memory_before
+        if profiler is not None:
+            profiler.disable()
+            _local.profiling = False
+        with _lock:
+            stats = _stats.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak': 0, 'allocated': 0})
+            stats['calls'] += 1
+            stats['wall'] += wall
+            stats['cpu'] += cpu
+            stats['peak'] = max(stats['peak'], peak)
+            stats['allocated'] += allocated
+
+
+def _start_peak():
+    # tracemalloc has a single process-wide peak: hand it to the stages in progress before resetting it.
+    with _lock:
+        current, peak = tracemalloc.get_traced_memory()
+        for open_peak in _open_peaks:
+            open_peak[0] = max(open_peak[0], peak)
+        tracemalloc.reset_peak()
+        open_peak = [current]
+        _open_peaks.append(open_peak)
+    return current, open_peak
+
+
+def _end_peak(open_peak):
+    with _lock:
+        current, peak = tracemalloc.get_traced_memory()
+        _open_peaks.remove(open_peak)
+    return current, max(open_peak[0], peak)
+
+
+def _start_cprofile(name):
+    # Nested stages are part of the enclosing stage's profile.
+    if getattr(_local, 'profiling', False):
+        return None
+    with _lock:
+        profiler = _profilers.setdefault(name, cProfile.Profile())
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is active, e.g. the same stage in another thread.
+        return None
+    _local.profiling = True
+    return profiler
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def print_summary():
+    if not _stats:
+        return
+    ranked = sorted(_stats.items(), key=lambda item: item[1]['wall'], reverse=True)
+    total_wall = sum(stats['wall'] for name, stats in ranked if not name.startswith('api ')) or 1
+    log(f"{'stage':<40}{'calls':>8}{'wall (s)':>11}{'cpu (s)':>10}{'peak (MiB)':>12}{'alloc (MiB)':>13}{'local %':>9}")
+    for name, stats in ranked:
+        share = '' if name.startswith('api ') else f"{100 * stats['wall'] / total_wall:.0f}"
+        log(f"{name[:39]:<40}{stats['calls']:>8}{stats['wall']:>11.3f}{stats['cpu']:>10.3f}"
+            f"{stats['peak'] / 2 ** 20:>12.1f}{stats['allocated'] / 2 ** 20:>13.1f}{share:>9}")
+
+    profile_dir = settings['profile_dir']
+    os.makedirs(profile_dir, exist_ok=True)
+    for name, profiler in _profilers.items():
+        profiler.dump_stats(os.path.join(profile_dir, f"{name.replace(' ', '_').replace('/', '_')}.prof"))
+    with open(os.path.join(profile_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump({name: stats for name, stats in ranked}, f, indent=4)
+    log(f'Profile written to {profile_dir}')
+
+
+if os.environ.get('QS_PROFILE'):
+    configure_profiling(modes={'timers'} | set(os.environ['QS_PROFILE'].split(',')))
@@ -0,0 +1,216 @@
+import boto3
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from error_handling import call_with_retry, run_operation
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_verbose, log
+
+'''
+This script promotes a batch of dashboards as a group (blue/green).
+    1. The currently published VersionNumber of every dashboard is recorded in the rollback file.
+    2. A new version is created for every dashboard in parallel, and the script waits on all of them together.
+    3. Only if every new version succeeded, all of them are published in parallel.
+    4. If any version failed, nothing is published. If any publish failed, the dashboards already published are reverted to
+       their recorded versions in one parallel pass.
+The rollback file can also be used later to revert a promotion whose new versions render broken, using --rollback. Only the
+dashboards whose published version was changed by the promotion are reverted.
+Failed promotion calls are not written to the dead-letter file, as replaying them out of order would publish the wrong versions;
+--rollback or a new promotion re-drives them instead.
+For detailed explanation of the parameters, refer: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/quicksight/client/update_dashboard.html
+Note: Ensure active credentials before executing this script. The dashboards must already exist; create new ones with create_dashboard.py.
+
+Args:
+    target_account_id (str): The AWS account ID of the target environment (e.g., prod).
+    region_name (str): The AWS region where QuickSight is deployed.
+    dashboards_file_path (str): The path to a JSON file listing the dashboards to promote. Content as below.
+        [
+          {
+            "DashboardId": "my-dashboard-id",
+            "DashboardName": "My Dashboard",
+            "SourceTemplateArn": "arn:aws:quicksight:us-west-2:123456789012:template/my-template",
+            "DataSetReferencesFilePath": "./target_dataset_references.json",
+            "VersionDescription": "2"
+          }
+        ]
+    rollback_file_path (str): Optional. Where the previous version numbers are recorded. Defaults to qs_extracts/dashboard_promotion.json.
+    rollback (bool): Optional. Only revert the dashboards recorded in the rollback file to their previous versions.
+    max_workers (int): Optional. The number of dashboards processed in parallel. Defaults to 8.
+    timeout (int): Optional. Seconds to wait for the new versions. Defaults to 900.
+
+Return:
+    None
+
+Execution:
+    python promote_dashboards.py --target-account-id 123456789012 --region-name us-west-2 --dashboards-file-path "./dashboards.json"
+    python promote_dashboards.py --target-account-id 123456789012 --region-name us-west-2 --rollback
+'''
+
+parser = argparse.ArgumentParser(description='Promote a batch of QuickSight Dashboards with automatic rollback')
+parser.add_argument('--target-account-id', '-t', type=str, required=True,
+                    help='The AWS account ID of the target environment (e.g., prod)')
+parser.add_argument('--region-name', '-r', type=str, required=True,
+                    help='The AWS region where QuickSight is deployed')
+parser.add_argument('--dashboards-file-path', '-f', type=str,
+                    help='JSON file listing the dashboards to promote.')
+parser.add_argument('--rollback-file-path', '-b', type=str, default='qs_extracts/dashboard_promotion.json',
+                    help='Where the previous version numbers are recorded.')
+parser.add_argument('--rollback', action='store_true',
+                    help='Only revert the dashboards recorded in the rollback file to their previous versions.')
+parser.add_argument('--max-workers', '-w', type=int, default=8,
+                    help='The number of dashboards processed in parallel.')
+parser.add_argument('--timeout', type=int, default=900,
+                    help='Seconds to wait for the new dashboard versions.')
+
+add_output_arguments(parser)
+add_profiling_arguments(parser)
+args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
+
+target_account_id = args.target_account_id
+region_name = args.region_name
+dashboards_file_path = args.dashboards_file_path
+rollback_file_path = args.rollback_file_path
+max_workers = args.max_workers
+timeout = args.timeout
+
+if not args.rollback and not dashboards_file_path:
+    parser.error('--dashboards-file-path is required unless --rollback is passed')
+
+client = boto3.client('quicksight', region_name=region_name)
+
+SUCCESSFUL_STATUSES = {'CREATION_SUCCESSFUL', 'UPDATE_SUCCESSFUL'}
+FAILED_STATUSES = {'CREATION_FAILED', 'UPDATE_FAILED', 'DELETED'}
+
+
+def parallel(function, items):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(function, items))
+
+
+def save_promotion(promotion):
+    os.makedirs(os.path.dirname(rollback_file_path) or '.', exist_ok=True)
+    with open(rollback_file_path, 'w', encoding='utf-8') as f:
+        json.dump(promotion, f, ensure_ascii=False, indent=4)
+
+
+def published_version(dashboard_id):
+    response = call_with_retry(client, 'describe_dashboard', AwsAccountId=target_account_id, DashboardId=dashboard_id)
+    return response['Dashboard']['Version']['VersionNumber']
+
+
+def create_version(dashboard):
+    with open(dashboard['DataSetReferencesFilePath']) as dataset_references_file:
+        dataset_references = json.load(dataset_references_file)
+    kwargs = {
+        'AwsAccountId': target_account_id,
+        'DashboardId': dashboard['DashboardId'],
+        'Name': dashboard['DashboardName'],
+        'SourceEntity': {
+            'SourceTemplate': {
+                'DataSetReferences': dataset_references,
+                'Arn': dashboard['SourceTemplateArn']
+            }
+        },
+    }
+    if 'VersionDescription' in dashboard:
+        kwargs['VersionDescription'] = dashboard['VersionDescription']
+    response = run_operation(client, 'update_dashboard', dashboard['DashboardId'], region_name, dead_letter_file_path=None,
+                             **kwargs)
+    if response is None:
+        return None
+    # VersionArn ends with /version/<VersionNumber>
+    return int(response['VersionArn'].rsplit('/', 1)[1])
+
+
+def wait_for_version(entry):
+    if entry['NewVersionNumber'] is None:
+        return 'CREATION_FAILED'
+    deadline = time.monotonic() + timeout
+    while True:
+        response = call_with_retry(client, 'describe_dashboard', AwsAccountId=target_account_id,
+                                   DashboardId=entry['DashboardId'], VersionNumber=entry['NewVersionNumber'])
+        status = response['Dashboard']['Version']['Status']
+        if status in SUCCESSFUL_STATUSES or status in FAILED_STATUSES:
+            return status
+        if time.monotonic() > deadline:
+            return f'TIMED_OUT_{status}'
+        time.sleep(5)
+
+
+def publish(dashboard_id, version_number):
+    response = run_operation(client, 'update_dashboard_published_version', dashboard_id, region_name, dead_letter_file_path=None,
+                             AwsAccountId=target_account_id, DashboardId=dashboard_id, VersionNumber=version_number)
+    return response is not None
+
+
+def rollback(promotion):
+    '''
+    Reverts the dashboards whose published version was changed by the promotion. Returns whether all of them were reverted.
+    '''
+    changed = [entry for entry in promotion['Dashboards'] if entry.get('Published')]
+    if not changed:
+        log('No dashboard of the promotion is published, nothing to revert')
+        return True
+    log(f"Reverting {len(changed)} dashboards to their previous versions")
+    results = parallel(lambda entry: publish(entry['DashboardId'], entry['PreviousVersionNumber']), changed)
+    for entry, reverted in zip(changed, results):
+        entry['Status'] = 'ROLLED_BACK' if reverted else 'ROLLBACK_FAILED'
+        entry['Published'] = not reverted
+        log(f"{entry['DashboardId']}: {entry['Status']} to version {entry['PreviousVersionNumber']}")
+    save_promotion(promotion)
+    return all(results)
+
+
+if args.rollback:
+    with open(rollback_file_path) as promotion_file:
+        promotion = json.load(promotion_file)
+    raise SystemExit(0 if rollback(promotion) else 1)
+
+with open(dashboards_file_path) as dashboards_file:
+    dashboards = json.load(dashboards_file)
+
+log(f'Promoting {len(dashboards)} dashboards in account {target_account_id}')
+
+# Record the published versions before anything changes, so rollback is a single parallel pass.
+previous_versions = parallel(lambda dashboard: published_version(dashboard['DashboardId']), dashboards)
+promotion = {
+    'TargetAccountId': target_account_id,
+    'RegionName': region_name,
+    'Dashboards': [
+        {'DashboardId': dashboard['DashboardId'], 'PreviousVersionNumber': version, 'NewVersionNumber': None, 'Status': 'PENDING',
+         'Published': False}
+        for dashboard, version in zip(dashboards, previous_versions)
+    ],
+}
+save_promotion(promotion)
+
+for entry, version in zip(promotion['Dashboards'], parallel(create_version, dashboards)):
+    entry['NewVersionNumber'] = version
+save_promotion(promotion)
+
+for entry, status in zip(promotion['Dashboards'], parallel(wait_for_version, promotion['Dashboards'])):
+    entry['Status'] = status
+save_promotion(promotion)
+print_verbose(promotion['Dashboards'])
+
+if not all(entry['Status'] in SUCCESSFUL_STATUSES for entry in promotion['Dashboards']):
+    log('Not every new dashboard version succeeded, nothing is published')
+    raise SystemExit(1)
+
+published = parallel(lambda entry: publish(entry['DashboardId'], entry['NewVersionNumber']), promotion['Dashboards'])
+for entry, done in zip(promotion['Dashboards'], published):
+    entry['Published'] = done
+save_promotion(promotion)
+if not all(published):
+    log('Publishing failed for part of the batch')
+    rollback(promotion)
+    raise SystemExit(1)
+
+for entry in promotion['Dashboards']:
+    entry['Status'] = 'PUBLISHED'
+save_promotion(promotion)
+log(f"Published {len(promotion['Dashboards'])} dashboards. Revert them with --rollback if the new versions render broken.")
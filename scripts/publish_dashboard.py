@@ -1,6 +1,8 @@
 import boto3
-from pprint import pformat
 import argparse
+from error_handling import run_operation
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_verbose
 
 '''
 This script updates the published version of a dashboard.
@@ -30,7 +32,11 @@ parser.add_argument('--dashboard-id', '-i', type=str, required=True,
 parser.add_argument('--dashboard-version', '-v', type=int, required=True,
                     help='The version of the dashboard to be made live')
 
+add_output_arguments(parser)
+add_profiling_arguments(parser)
 args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
 
 target_account_id = args.target_account_id
 region_name = args.region_name
@@ -39,10 +45,13 @@ dashboard_version = args.dashboard_version
 
 client = boto3.client('quicksight', region_name=region_name)
 
-response = client.update_dashboard_published_version(
+response = run_operation(
+    client, 'update_dashboard_published_version', dashboard_id, region_name,
     AwsAccountId=target_account_id,
     DashboardId=dashboard_id,
     VersionNumber=dashboard_version
 )
 
-print(pformat(response))
+print_verbose(response)
+if response is None:
+    raise SystemExit(1)
@@ -0,0 +1,41 @@
+import argparse
+import json
+from lineage_index import INDEX_FILE_PATH, downstream_assets, load_index
+from result_output import log
+
+'''
+This script returns the minimal set of assets to redeploy after one or more datasets changed, using the lineage index
+built by build_lineage.py. No QuickSight calls are made.
+The result lists the changed datasets, the datasets built on them, and the templates, analyses and dashboards that use any of them,
+in deploy order.
+
+Args:
+    data_set_ids (str []): The IDs of the changed datasets.
+    columns (str []): Optional. Only these columns changed. Assets whose scanned definition uses none of them are skipped.
+    index_file_path (str): Optional. The lineage index file. Defaults to qs_extracts/lineage_index.json.
+
+Return:
+    prints {"DataSet": [...], "Template": [...], "Analysis": [...], "Dashboard": [...]} as JSON
+
+Execution:
+    python query_lineage.py --data-set-ids dataset1 dataset2
+    python query_lineage.py --data-set-ids dataset1 --columns order_date revenue
+'''
+
+parser = argparse.ArgumentParser(description='List the QuickSight assets to redeploy after datasets changed')
+parser.add_argument('--data-set-ids', '-d', nargs='+', type=str, required=True,
+                    help='The IDs of the changed datasets, seperated by a white space')
+parser.add_argument('--columns', '-c', nargs='+', type=str,
+                    help='Only these columns changed, seperated by a white space')
+parser.add_argument('--index-file-path', '-x', type=str, default=INDEX_FILE_PATH,
+                    help='The lineage index file')
+
+args = parser.parse_args()
+
+index = load_index(args.index_file_path)
+unknown = [data_set_id for data_set_id in args.data_set_ids if f'DataSet/{data_set_id}' not in index['Assets']]
+if unknown:
+    log(f'Not in the lineage index: {", ".join(unknown)}. Run build_lineage.py first.')
+
+assets = downstream_assets(index, args.data_set_ids, args.columns)
+print(json.dumps(assets, indent=4))
@@ -0,0 +1,37 @@
+import threading
+import time
+
+'''
+A shared rate budget for scripts that send QuickSight calls from several threads.
+QuickSight throttles per account and API, so parallel scripts spread their calls over time instead of bursting into
+ThrottlingException and backing off (see error_handling.py).
+
+Usage:
+    budget = RateBudget(calls_per_second=2)
+    budget.acquire()    # blocks until the next call may be sent
+'''
+
+
+class RateBudget:
+    '''
+    Thread-safe token bucket allowing calls_per_second calls on average and bursts of up to burst calls.
+    '''
+
+    def __init__(self, calls_per_second, burst=1):
+        self.interval = 1.0 / calls_per_second
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.interval
+            time.sleep(wait)
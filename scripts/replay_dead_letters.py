@@ -0,0 +1,80 @@
+import boto3
+import argparse
+import json
+import os
+from error_handling import DEAD_LETTER_FILE_PATH, read_dead_letters, run_operation
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import add_output_arguments, configure_output, print_verbose, log
+
+'''
+This script replays the operations recorded in the dead-letter file by the other scripts.
+Only the failed operations are re-driven; each one goes through the same retry and create-to-update handling as the original run.
+Operations that fail again are written back to the dead-letter file, successful ones are removed from it.
+Note: Ensure active credentials before executing this script. Fix the cause of a permanent failure first, either in the source files or
+by editing the "kwargs" of the entry in the dead-letter file.
+
+Args:
+    dead_letter_file_path (str): The path to the dead-letter file. Defaults to qs_extracts/dead_letters.jsonl.
+    asset_ids (str []): Optional. Replay only the entries for these asset IDs; the other entries are kept as they are.
+    dry_run (bool): Optional. Only list the entries that would be replayed.
+
+Return:
+    Exits with 1 if any replayed operation failed again.
+
+Execution:
+    python replay_dead_letters.py
+    python replay_dead_letters.py --dead-letter-file-path qs_extracts/dead_letters.jsonl --asset-ids dataset1 dataset2
+'''
+
+parser = argparse.ArgumentParser(description='Replay failed QuickSight operations from the dead-letter file')
+parser.add_argument('--dead-letter-file-path', '-f', type=str, default=DEAD_LETTER_FILE_PATH,
+                    help='The path to the dead-letter file')
+parser.add_argument('--asset-ids', '-i', nargs='+', type=str,
+                    help='Replay only the entries for these asset IDs, seperated by a white space')
+parser.add_argument('--dry-run', action='store_true',
+                    help='Only list the entries that would be replayed')
+
+add_output_arguments(parser)
+add_profiling_arguments(parser)
+args = parser.parse_args()
+configure_output(args)
+configure_profiling(args)
+
+dead_letter_file_path = args.dead_letter_file_path
+asset_ids = args.asset_ids
+dry_run = args.dry_run
+
+entries = read_dead_letters(dead_letter_file_path)
+selected = [entry for entry in entries if asset_ids is None or entry['asset_id'] in asset_ids]
+kept = [entry for entry in entries if entry not in selected]
+
+log(f'{len(selected)} of {len(entries)} dead-letter entries selected for replay')
+for entry in selected:
+    log(f"{entry['operation']} {entry['asset_id']} ({entry['kind']}, {entry['error_code']})")
+
+if dry_run or not selected:
+    raise SystemExit(0)
+
+# Start a fresh dead-letter file: the kept entries go back as they are and the replay appends what fails again.
+backup_file_path = f'{dead_letter_file_path}.bak'
+os.replace(dead_letter_file_path, backup_file_path)
+with open(dead_letter_file_path, 'w', encoding='utf-8') as f:
+    for entry in kept:
+        f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+clients = {}
+succeeded = 0
+for entry in selected:
+    region_name = entry['region_name']
+    if region_name not in clients:
+        clients[region_name] = boto3.client('quicksight', region_name=region_name)
+    response = run_operation(clients[region_name], entry['operation'], entry['asset_id'], region_name,
+                             dead_letter_file_path=dead_letter_file_path, **entry['kwargs'])
+    if response is not None:
+        succeeded += 1
+        print_verbose(response)
+
+os.remove(backup_file_path)
+log(f'Replayed {len(selected)} operations: {succeeded} succeeded, {len(selected) - succeeded} written back to {dead_letter_file_path}')
+if succeeded < len(selected):
+    raise SystemExit(1)
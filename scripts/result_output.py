@@ -0,0 +1,160 @@
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pprint import pformat
+
+from json_store import JsonStore
+from profiling import stage
+
+'''
+Structured output of the migration scripts.
+Every operation emits one compact JSON line on stdout, and the latest result per asset is kept in the result manifest
+(qs_extracts/result_manifest.json by default, with its journal, see json_store.py), so later steps can read ARNs and version numbers directly instead of scraping logs.
+Human-readable messages, and the full responses pretty-printed with --verbose, go to stderr, so stdout holds only JSON lines.
+
+Event:
+    {"asset": "my-dashboard-id", "asset_type": "Dashboard", "account": "123456789012", "action": "update_dashboard",
+     "status": "succeeded", "arn": "arn:aws:quicksight:...", "version": 3, "duration_ms": 412, "error_code": null, "time": "..."}
+
+Manifest:
+    {"Results": {"123456789012/Dashboard/my-dashboard-id": {<the last event of the asset>}}}
+    An event without an ARN or version (e.g. a failed attempt, or update_template_permissions) keeps those of the previous one.
+
+Usage in a script:
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    configure_output(args)
+'''
+
+MANIFEST_FILE_PATH = 'qs_extracts/result_manifest.json'
+
+settings = {
+    'verbose': False,
+    'manifest_file_path': MANIFEST_FILE_PATH,
+}
+
+# The asset type of each operation, used to key the manifest.
+ASSET_TYPES = {
+    'data_source': 'DataSource',
+    'data_set': 'DataSet',
+    'template': 'Template',
+    'analysis': 'Analysis',
+    'dashboard': 'Dashboard',
+}
+
+
+def add_output_arguments(parser):
+    parser.add_argument('--verbose', action='store_true',
+                        help='Pretty-print the full API responses')
+    parser.add_argument('--manifest-file-path', type=str, default=MANIFEST_FILE_PATH,
+                        help='The result manifest file, updated with the result of every operation')
+
+
+def configure_output(args):
+    settings['verbose'] = args.verbose
+    settings['manifest_file_path'] = args.manifest_file_path
+
+
+def log(message):
+    '''
+    Prints a human-readable message on stderr.
+    '''
+    print(message, file=sys.stderr)
+
+
+def print_verbose(value, label=None):
+    '''
+    Pretty-prints a value on stderr, only with --verbose.
+    '''
+    if settings['verbose']:
+        with stage('pformat'):
+            text = pformat(value)
+        log(f'{label} \n {text}' if label else text)
+
+
+def print_result(value):
+    '''
+    Prints a value the script was asked for: pretty-printed with --verbose, as one compact JSON line otherwise.
+    '''
+    if settings['verbose']:
+        with stage('pformat'):
+            text = pformat(value)
+    else:
+        with stage('json.dumps result'):
+            text = json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+    print(text)
+
+
+def asset_type(action):
+    for suffix, name in ASSET_TYPES.items():
+        if action.endswith(suffix) or f'_{suffix}_' in action:
+            return name
+    return None
+
+
+def _arn(response):
+    for key in ('Arn', 'DashboardArn', 'AnalysisArn', 'TemplateArn', 'DataSetArn', 'DataSourceArn'):
+        if key in response:
+            return response[key]
+    return None
+
+
+def _version(response, kwargs):
+    if 'VersionArn' in response:
+        # VersionArn ends with /version/<VersionNumber>
+        return int(response['VersionArn'].rsplit('/', 1)[1])
+    return kwargs.get('VersionNumber')
+
+
+def emit_event(asset_id, action, started, response=None, error_code=None, kwargs=None):
+    '''
+    Prints the JSON line of an operation and records it in the result manifest.
+
+    Args:
+        asset_id (str): The ID of the asset the operation acted on.
+        action (str): The operation, e.g. create_data_set.
+        started (float): time.perf_counter() when the operation started.
+        response (dict): The API response, or None if the operation failed.
+        error_code (str): The error code if the operation failed.
+        kwargs (dict): The keyword arguments of the API call, used to find the account and the version number of publish calls.
+
+    Return:
+        event (dict): The emitted event.
+    '''
+    response = response or {}
+    kwargs = kwargs or {}
+    event = {
+        'asset': asset_id,
+        'asset_type': asset_type(action),
+        'account': kwargs.get('AwsAccountId'),
+        'action': action,
+        'status': 'failed' if error_code else 'succeeded',
+        'arn': _arn(response),
+        'version': _version(response, kwargs),
+        'duration_ms': round((time.perf_counter() - started) * 1000),
+        'error_code': error_code,
+        'time': datetime.now(timezone.utc).isoformat(),
+    }
+    print(json.dumps(event, ensure_ascii=False, separators=(',', ':')))
+    _record(event)
+    return event
+
+
+def _store(manifest_file_path):
+    return JsonStore.at(manifest_file_path, ('Results',))
+
+
+def manifest_key(account_id, asset_type, asset_id):
+    return f'{account_id}/{asset_type}/{asset_id}'
+
+
+def _record(event):
+    # An event without an ARN or version must not hide those of the previous one.
+    fields = {key: value for key, value in event.items() if key not in ('arn', 'version') or value is not None}
+    _store(settings['manifest_file_path']).set(
+        'Results', manifest_key(event['account'], event['asset_type'], event['asset']), fields, merge=True)
+
+
+def load_manifest(manifest_file_path=MANIFEST_FILE_PATH):
+    return _store(manifest_file_path).load()
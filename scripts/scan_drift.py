@@ -0,0 +1,184 @@
+import boto3
+from pprint import pformat
+import argparse
+import copy
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from deploy_state import STATE_FILE_PATH, asset_key, describe_fingerprint, load_state, save_state
+from profiling import add_profiling_arguments, configure_profiling
+from error_handling import call_with_retry
+from result_output import log
+
+'''
+This script detects drift between the assets in the target account and their last deployed state, e.g. edits made in the console.
+The scan is incremental: one list call (per page) per asset type finds the LastUpdatedTime of every asset, and only the assets
+whose LastUpdatedTime moved since the recorded deploy are described and fingerprinted. The deployed fingerprint is recorded by
+run_operation at deploy time (see deploy_state.py); assets whose baseline is still pending are described once to record it, and
+listed in the report, as a change made before this scan cannot be told apart from the deploy.
+For detailed explanation of the parameters, refer: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/quicksight/client/list_data_sets.html
+Note: Ensure active credentials before executing this script.
+
+Args:
+    target_account_id (str): The AWS account ID of the target environment (e.g., prod).
+    region_name (str): The AWS region where QuickSight is deployed.
+    state_file_path (str): Optional. The deploy state file. Defaults to qs_extracts/deploy_state.json.
+    report_file_path (str): Optional. Where the drift report is written. Defaults to qs_extracts/drift_report.json.
+    block (bool): Optional. Block the next deploy of drifted assets; run_operation refuses them until they are re-recorded.
+    record (bool): Optional. Record the current state of the assets as deployed instead of scanning, and unblock them.
+        Use it after reconciling a drifted asset, or to start tracking assets deployed before the deploy state existed.
+    asset_type (str): Optional, with --record. The type of the assets passed in --asset-ids.
+    asset_ids (str []): Optional, with --record. The assets to record. Defaults to every tracked asset of the account.
+    max_workers (int): Optional. The number of describe calls made in parallel. Defaults to 8.
+
+Return:
+    Exits with 1 if drift was found.
+
+Execution:
+    python scan_drift.py --target-account-id 123456789012 --region-name us-west-2 --block
+    python scan_drift.py --target-account-id 123456789012 --region-name us-west-2 --record --asset-type DataSet --asset-ids dataset1 dataset2
+'''
+
+# asset type: (list operation, summaries key, ID key)
+ASSET_TYPES = {
+    'DataSource': ('list_data_sources', 'DataSources', 'DataSourceId'),
+    'DataSet': ('list_data_sets', 'DataSetSummaries', 'DataSetId'),
+    'Template': ('list_templates', 'TemplateSummaryList', 'TemplateId'),
+    'Analysis': ('list_analyses', 'AnalysisSummaryList', 'AnalysisId'),
+    'Dashboard': ('list_dashboards', 'DashboardSummaryList', 'DashboardId'),
+}
+
+parser = argparse.ArgumentParser(description='Detect drift of QuickSight assets from their deployed state')
+parser.add_argument('--target-account-id', '-t', type=str, required=True,
+                    help='The AWS account ID of the target environment (e.g., prod)')
+parser.add_argument('--region-name', '-r', type=str, required=True,
+                    help='The AWS region where QuickSight is deployed')
+parser.add_argument('--state-file-path', '-f', type=str, default=STATE_FILE_PATH,
+                    help='The deploy state file')
+parser.add_argument('--report-file-path', '-o', type=str, default='qs_extracts/drift_report.json',
+                    help='Where the drift report is written')
+parser.add_argument('--block', action='store_true',
+                    help='Block the next deploy of drifted assets')
+parser.add_argument('--record', action='store_true',
+                    help='Record the current state of the assets as deployed and unblock them')
+parser.add_argument('--asset-type', '-a', type=str, choices=sorted(ASSET_TYPES),
+                    help='The type of the assets passed in --asset-ids')
+parser.add_argument('--asset-ids', '-i', nargs='+', type=str,
+                    help='The assets to record, seperated by a white space')
+parser.add_argument('--max-workers', '-w', type=int, default=8,
+                    help='The number of describe calls made in parallel')
+
+add_profiling_arguments(parser)
+args = parser.parse_args()
+configure_profiling(args)
+
+target_account_id = args.target_account_id
+region_name = args.region_name
+state_file_path = args.state_file_path
+report_file_path = args.report_file_path
+max_workers = args.max_workers
+
+if args.asset_ids and not (args.record and args.asset_type):
+    parser.error('--asset-ids requires --record and --asset-type')
+
+client = boto3.client('quicksight', region_name=region_name)
+
+
+def list_last_updated_times(asset_type):
+    '''
+    Returns {asset ID: LastUpdatedTime} for every asset of a type in the account, using only list calls.
+    '''
+    list_operation, summaries_key, id_key = ASSET_TYPES[asset_type]
+    last_updated_times = {}
+    kwargs = {'AwsAccountId': target_account_id}
+    while True:
+        response = call_with_retry(client, list_operation, **kwargs)
+        for summary in response.get(summaries_key, []):
+            if summary.get('Status') != 'DELETED':
+                last_updated_times[summary[id_key]] = str(summary.get('LastUpdatedTime'))
+        if not response.get('NextToken'):
+            return last_updated_times
+        kwargs['NextToken'] = response['NextToken']
+
+
+def describe(entry):
+    return describe_fingerprint(partial(call_with_retry, client), target_account_id, entry['AssetType'], entry['AssetId'])
+
+
+def describe_all(entries):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(describe, entries))
+
+
+base = load_state(state_file_path)
+state = copy.deepcopy(base)
+assets = state['Assets']
+
+if args.record and args.asset_ids:
+    for asset_id in args.asset_ids:
+        key = asset_key(target_account_id, args.asset_type, asset_id)
+        assets.setdefault(key, {'AccountId': target_account_id, 'AssetType': args.asset_type, 'AssetId': asset_id,
+                                'DeployedAt': None, 'Fingerprint': None, 'LastUpdatedTime': None, 'Blocked': False})
+    tracked = [assets[asset_key(target_account_id, args.asset_type, asset_id)] for asset_id in args.asset_ids]
+else:
+    tracked = [entry for entry in assets.values() if entry['AccountId'] == target_account_id]
+
+asset_types = sorted({entry['AssetType'] for entry in tracked})
+listed = {asset_type: list_last_updated_times(asset_type) for asset_type in asset_types}
+log(f'{len(tracked)} tracked assets, {sum(len(ids) for ids in listed.values())} listed in account {target_account_id}')
+
+deleted = [entry for entry in tracked if entry['AssetId'] not in listed[entry['AssetType']]]
+present = [entry for entry in tracked if entry['AssetId'] in listed[entry['AssetType']]]
+if args.record:
+    to_record, candidates = present, []
+else:
+    to_record = [entry for entry in present if entry['Fingerprint'] is None]
+    candidates = [entry for entry in present if entry['Fingerprint'] is not None
+                  and listed[entry['AssetType']][entry['AssetId']] != entry['LastUpdatedTime']]
+
+fingerprints = describe_all(to_record + candidates)
+log(f'Described {len(fingerprints)} assets')
+if to_record and not args.record:
+    log(f'{len(to_record)} assets had no baseline; their current state is recorded, changes made to them before this scan are not reported')
+
+for entry, current in zip(to_record, fingerprints):
+    entry['Fingerprint'] = current
+    entry['LastUpdatedTime'] = listed[entry['AssetType']][entry['AssetId']]
+    entry['Blocked'] = False
+
+drifted = []
+for entry, current in zip(candidates, fingerprints[len(to_record):]):
+    if current == entry['Fingerprint']:
+        # Touched without a content change, e.g. a refresh; move the recorded timestamp forward.
+        entry['LastUpdatedTime'] = listed[entry['AssetType']][entry['AssetId']]
+    else:
+        drifted.append(entry)
+
+if args.block:
+    for entry in drifted + deleted:
+        entry['Blocked'] = True
+save_state(state, base, state_file_path)
+
+report = {
+    'ScannedAt': datetime.now(timezone.utc).isoformat(),
+    'TargetAccountId': target_account_id,
+    'Tracked': len(tracked),
+    'Described': len(fingerprints),
+    'Recorded': [{'AssetType': entry['AssetType'], 'AssetId': entry['AssetId']} for entry in to_record],
+    'Drifted': [{'AssetType': entry['AssetType'], 'AssetId': entry['AssetId'], 'Drift': 'MODIFIED',
+                 'LastUpdatedTime': listed[entry['AssetType']][entry['AssetId']], 'Blocked': entry['Blocked']}
+                for entry in drifted] +
+               [{'AssetType': entry['AssetType'], 'AssetId': entry['AssetId'], 'Drift': 'DELETED',
+                 'LastUpdatedTime': None, 'Blocked': entry['Blocked']}
+                for entry in deleted],
+}
+os.makedirs(os.path.dirname(report_file_path) or '.', exist_ok=True)
+with open(report_file_path, 'w', encoding='utf-8') as f:
+    json.dump(report, f, ensure_ascii=False, indent=4)
+
+log(f"Recorded {len(report['Recorded'])} assets, {len(report['Drifted'])} drifted. Report written to {report_file_path}")
+if report['Drifted']:
+    log(pformat(report['Drifted']))
+    raise SystemExit(1)
@@ -0,0 +1,112 @@
+import argparse
+import json
+from functools import partial
+from preflight import data_set_requests, known_arns, print_errors, quicksight_arn, template_request, validate_all
+from profiling import add_profiling_arguments, configure_profiling
+from result_output import log
+
+'''
+This script validates a whole migration batch offline, before the first mutating call, against the QuickSight service model
+that ships with boto3 (see preflight.py). No QuickSight calls are made and no credentials are needed.
+It builds the requests the scripts are about to send from the dataset extracts, the dataset references files and the plan file,
+validates them in parallel processes, and prints one JSON line per invalid request.
+create_data_set.py and update_data_set.py run the same validation for their data sets on their own.
+
+Args:
+    target_account_id (str): The AWS account ID of the target environment (e.g., prod).
+    region_name (str): The AWS region where QuickSight is deployed.
+    source_account_id (str): Optional. The AWS account ID of the source environment, where templates are created.
+    data_set_list (str []): Optional. The IDs of the data sets to be created or updated.
+    data_source_arn (str): Optional, with --data-set-list. The ARN of the data source the data sets use in the target account.
+    plan_file_path (str): Optional. A JSON file listing the templates, analyses and dashboards to be created or updated. Content as below.
+        {
+          "Templates": [{"TemplateId": "my-template-id", "TemplateName": "My Template", "VersionDescription": "1",
+                         "SourceAnalysisArn": "arn:aws:quicksight:...:analysis/my-analysis", "DataSetReferencesFilePath": "./source_dataset_references.json"}],
+          "Analyses": [{"AnalysisId": "my-analysis-id", "AnalysisName": "My Analysis",
+                        "SourceTemplateArn": "arn:aws:quicksight:...:template/my-template", "DataSetReferencesFilePath": "./target_dataset_references.json"}],
+          "Dashboards": [{"DashboardId": "my-dashboard-id", "DashboardName": "My Dashboard", "VersionDescription": "1",
+                          "SourceTemplateArn": "arn:aws:quicksight:...:template/my-template", "DataSetReferencesFilePath": "./target_dataset_references.json"}]
+        }
+        The dashboards file of promote_dashboards.py (a list) is accepted as well.
+    max_workers (int): Optional. The number of worker processes validating the requests. Defaults to the number of CPUs.
+
+Return:
+    Exits with 1 if any request is invalid.
+
+Execution:
+    python validate_requests.py --target-account-id 123456789012 --region-name us-west-2 --data-set-list dataset1 dataset2 \
+    --data-source-arn "arn:aws:quicksight:us-west-2:123456789012:datasource/my-data-source" --plan-file-path "./plan.json"
+'''
+
+parser = argparse.ArgumentParser(description='Validate QuickSight migration requests offline')
+parser.add_argument('--target-account-id', '-t', type=str, required=True,
+                    help='The AWS account ID of the target environment (e.g., prod)')
+parser.add_argument('--region-name', '-r', type=str, required=True,
+                    help='The AWS region where QuickSight is deployed')
+parser.add_argument('--source-account-id', '-a', type=str,
+                    help='The AWS account ID of the source environment, where templates are created')
+parser.add_argument('--data-set-list', '-d', nargs='+', type=str, default=[],
+                    help='The IDs of the data sets to be created or updated, seperated by a white space')
+parser.add_argument('--data-source-arn', '-s', type=str,
+                    help='The ARN of the data source the data sets use in the target account')
+parser.add_argument('--plan-file-path', '-f', type=str,
+                    help='JSON file listing the templates, analyses and dashboards to be created or updated')
+parser.add_argument('--max-workers', '-w', type=int,
+                    help='The number of worker processes validating the requests')
+
+add_profiling_arguments(parser)
+args = parser.parse_args()
+configure_profiling(args)
+
+target_account_id = args.target_account_id
+region_name = args.region_name
+source_account_id = args.source_account_id
+data_set_list = args.data_set_list
+data_source_arn = args.data_source_arn
+
+if data_set_list and not data_source_arn:
+    parser.error('--data-source-arn is required with --data-set-list')
+
+plan = {}
+if args.plan_file_path:
+    with open(args.plan_file_path) as plan_file:
+        plan = json.load(plan_file)
+    if isinstance(plan, list):
+        plan = {'Dashboards': plan}
+if plan.get('Templates') and not source_account_id:
+    parser.error('--source-account-id is required for templates')
+
+
+known = known_arns()
+known |= {quicksight_arn(region_name, target_account_id, 'dataset', data_set_id) for data_set_id in data_set_list}
+if data_source_arn:
+    known.add(data_source_arn)
+for entry in plan.get('Templates', []):
+    known.add(quicksight_arn(region_name, source_account_id, 'template', entry['TemplateId']))
+
+requests = data_set_requests('create_data_set', target_account_id, region_name, data_set_list, data_source_arn)
+for entry in plan.get('Templates', []):
+    fields = {'AwsAccountId': source_account_id, 'TemplateId': entry['TemplateId'], 'Name': entry['TemplateName']}
+    if 'VersionDescription' in entry:
+        fields['VersionDescription'] = entry['VersionDescription']
+    requests.append((f"template/{entry['TemplateId']}", 'create_template', source_account_id, region_name,
+                     partial(template_request, fields, 'SourceAnalysis', entry['SourceAnalysisArn'],
+                             entry['DataSetReferencesFilePath'])))
+for entry in plan.get('Analyses', []):
+    fields = {'AwsAccountId': target_account_id, 'AnalysisId': entry['AnalysisId'], 'Name': entry['AnalysisName']}
+    requests.append((f"analysis/{entry['AnalysisId']}", 'create_analysis', target_account_id, region_name,
+                     partial(template_request, fields, 'SourceTemplate', entry['SourceTemplateArn'],
+                             entry['DataSetReferencesFilePath'])))
+for entry in plan.get('Dashboards', []):
+    fields = {'AwsAccountId': target_account_id, 'DashboardId': entry['DashboardId'], 'Name': entry['DashboardName']}
+    if 'VersionDescription' in entry:
+        fields['VersionDescription'] = entry['VersionDescription']
+    requests.append((f"dashboard/{entry['DashboardId']}", 'create_dashboard', target_account_id, region_name,
+                     partial(template_request, fields, 'SourceTemplate', entry['SourceTemplateArn'],
+                             entry['DataSetReferencesFilePath'])))
+
+errors = validate_all(requests, known, args.max_workers)
+print_errors(errors)
+log(f'Validated {len(requests)} requests: {len(requests) - len(errors)} valid, {len(errors)} invalid')
+if errors:
+    raise SystemExit(1)